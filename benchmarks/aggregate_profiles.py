@@ -0,0 +1,83 @@
+"""Aggregate the route profiles written with the "Profile menus" setting.
+
+The .prof files of each route are merged into one pstats report, and the
+memory snapshots of each route are summed per source line, so the menu
+builders that dominate CPU time and allocations stand out across runs.
+Copy the profiles folder from the add-on data of the box to profile.
+
+    python benchmarks/aggregate_profiles.py PROFILES_DIR [--route ROUTE]
+        [--top N] [--sort cumulative|tottime|calls]
+"""
+import os
+import pstats
+import argparse
+import tracemalloc
+
+
+def group_by_route(profiles_dir, extension):
+    routes = {}
+    for filename in sorted(os.listdir(profiles_dir)):
+        if not filename.endswith(extension):
+            continue
+        # Files are named <route>-<date>-<time>-<pid><extension>
+        route = filename[:-len(extension)].rsplit("-", 3)[0]
+        routes.setdefault(route, []).append(
+            os.path.join(profiles_dir, filename)
+        )
+    return routes
+
+
+def print_cpu(route, filepaths, sort, top):
+    print("=== {0}: CPU, {1} runs ===".format(route, len(filepaths)))
+    stats = pstats.Stats(*filepaths)
+    print("{0:.3f} s per run".format(stats.total_tt / len(filepaths)))
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+
+
+def print_memory(route, filepaths, top):
+    print("=== {0}: memory, {1} runs ===".format(route, len(filepaths)))
+    lines = {}
+    for filepath in filepaths:
+        snapshot = tracemalloc.Snapshot.load(filepath)
+        for stat in snapshot.statistics("lineno"):
+            frame = stat.traceback[0]
+            line = lines.setdefault((frame.filename, frame.lineno), [0, 0])
+            line[0] += stat.size
+            line[1] += stat.count
+
+    total = sum(size for (size, _) in lines.values())
+    print("{0:.1f} kB per run".format(total / len(filepaths) / 1000))
+    for ((filename, lineno), (size, count)) in sorted(
+        lines.items(), key=lambda item: -item[1][0]
+    )[:top]:
+        print("{0:>10.1f} kB {1:>8} blocks  {2}:{3}".format(
+            size / len(filepaths) / 1000, count // len(filepaths),
+            filename, lineno
+        ))
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("profiles_dir")
+    parser.add_argument("--route", help="e.g. menu=panel")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument(
+        "--sort", default="cumulative",
+        choices=["cumulative", "tottime", "calls"]
+    )
+    args = parser.parse_args()
+
+    cpu_routes = group_by_route(args.profiles_dir, ".prof")
+    memory_routes = group_by_route(args.profiles_dir, ".snapshot")
+    for route in sorted(set(cpu_routes) | set(memory_routes)):
+        if args.route and route != args.route:
+            continue
+        if route in cpu_routes:
+            print_cpu(route, cpu_routes[route], args.sort, args.top)
+        if route in memory_routes:
+            print_memory(route, memory_routes[route], args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Count round trips of a multi-query screen with and without batching.
+
+A local stand-in for the GraphQL host answers single persisted queries
+(GET) and batches (POST with a list body) after an injected delay. The
+screen is a series page: getSeries followed by getSeason for every season.
+
+Before timing, the results of a batch are checked against the results of
+the single queries. The check covers the stand-in rejecting batches, which
+has to be remembered, and failing with a server error, which must not be.
+It also breaks one season, whose failure must not keep the others out of
+the cache.
+
+    python benchmarks/batching.py [--seasons N] [--latency MS] [--reject]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "benchmarks", "stubs"), ROOT]
+# The add-on reads its handle from argv, so keep the benchmark's own options
+ARGS = sys.argv[1:]
+sys.argv = ["plugin://plugin.video.teliaplay-se/", "1", ""]
+os.environ.setdefault("KODI_STUB_HOME", tempfile.mkdtemp())
+
+from resources.lib.api import TeliaPlay, TeliaException  # noqa: E402
+from resources.lib.operations import GRAPHQL_HOST  # noqa: E402
+from resources.lib.webutils import WebUtils, WebException  # noqa: E402
+
+
+def answer(operation, variables, seasons):
+    if operation == "getSeries":
+        return {"data": {"series": {"id": variables["id"], "seasonLinks": {
+            "items": [{"id": str(season)} for season in range(seasons)]
+        }}}}
+    return {"data": {"season": {"episodes": {"episodeItems": [
+        {"id": "m{0}-{1}".format(variables["seasonId"], episode)}
+        for episode in range(10)
+    ]}}}}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        variables = json.loads(query["variables"])
+        if variables.get("seasonId") in self.server.broken:
+            self.reply(502, {"message": "Bad gateway"})
+            return
+        self.reply(200, answer(
+            query["operationName"], variables, self.server.seasons
+        ))
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.batches += 1
+        if self.server.reject:
+            self.reply(400, {"errors": [{"message": "Batching is disabled"}]})
+            return
+        if self.server.fail:
+            self.reply(502, {"message": "Bad gateway"})
+            return
+        self.reply(200, [
+            {"errors": [{"message": "Season is unavailable"}]}
+            if item["variables"].get("seasonId") in self.server.broken
+            else answer(
+                item["operationName"], item["variables"], self.server.seasons
+            )
+            for item in body
+        ])
+
+    def reply(self, status, body):
+        self.server.round_trips += 1
+        time.sleep(self.server.latency)
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def series_screen(telia_play, batched):
+    series = telia_play.get_series("s1")
+    season_ids = [season["id"] for season in series["seasonLinks"]["items"]]
+    if batched:
+        return telia_play.get_seasons(season_ids)
+    return [telia_play.get_season(season_id) for season_id in season_ids]
+
+
+def new_telia_play(profile):
+    telia_play = TeliaPlay({
+        "bootUUID": "benchmark", "deviceUUID": "WEB-benchmark",
+        "tokenData": {"accessToken": "benchmark"}
+    })
+    # Start from an empty cache
+    telia_play.response_cache.cache_path = profile
+    return telia_play
+
+
+def check(server):
+    # Batched answers have to end up with the query that asked for them
+    server.latency = 0
+    server.round_trips = 0
+    for (reject, fail, remembered) in (
+        (False, False, False), (True, False, True), (False, True, False)
+    ):
+        server.reject = reject
+        server.fail = fail
+        with tempfile.TemporaryDirectory() as profile:
+            telia_play = new_telia_play(profile)
+            expected = series_screen(telia_play, batched=False)
+            telia_play.response_cache.clear("getSeason")
+            server.batches = 0
+            assert series_screen(telia_play, batched=True) == expected
+            for (season, episodes) in enumerate(expected):
+                assert all(
+                    episode["id"].startswith("m{0}-".format(season))
+                    for episode in episodes
+                )
+            assert server.batches == 1
+
+            # A rejection is remembered, a server error is not
+            telia_play.response_cache.clear("getSeason")
+            series_screen(telia_play, batched=True)
+            assert server.batches == (1 if remembered else 2)
+
+            # The seasons that came through are cached despite the broken one
+            telia_play.response_cache.clear("getSeason")
+            server.broken = ("3",)
+            try:
+                series_screen(telia_play, batched=True)
+            except (TeliaException, WebException):
+                pass
+            else:
+                raise AssertionError("The broken season went unnoticed")
+            server.broken = ()
+            server.round_trips = 0
+            for season_id in range(len(expected)):
+                if season_id != 3:
+                    telia_play.get_season(str(season_id))
+            assert server.round_trips == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seasons", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=50,
+                        help="injected server latency in milliseconds")
+    parser.add_argument("--reject", action="store_true",
+                        help="make the stand-in reject batches")
+    args = parser.parse_args(ARGS)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.seasons = args.seasons
+    server.broken = ()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Send everything meant for the GraphQL host to the stand-in
+    base_url = "http://127.0.0.1:{0}".format(server.server_address[1])
+    extract_url = WebUtils.extract_url
+    WebUtils.extract_url = lambda self, request: extract_url(
+        self, request).replace("https://" + GRAPHQL_HOST, base_url)
+
+    check(server)
+    server.latency = args.latency / 1000
+    server.reject = args.reject
+    server.fail = False
+
+    for batched in (False, True):
+        with tempfile.TemporaryDirectory() as profile:
+            telia_play = new_telia_play(profile)
+            server.round_trips = 0
+            start = time.perf_counter()
+            seasons = series_screen(telia_play, batched)
+            elapsed = (time.perf_counter() - start) * 1000
+            print("{0:<10} {1:3d} round trips {2:8.1f} ms   ({3} seasons)".format(
+                "batched" if batched else "sequential", server.round_trips,
+                elapsed, len(seasons)
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare per-click request latency with and without the HTTP broker.
+
+Every click builds a fresh WebUtils, just like a plugin invocation does.
+Without the broker each click therefore pays DNS, TCP and TLS set-up;
+with the broker the connection stays warm in the broker process.
+
+    python benchmarks/broker_latency.py [--clicks N] [--url URL | --local]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resources.lib import broker  # noqa: E402
+from resources.lib.webutils import WebUtils  # noqa: E402
+
+
+class LocalHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"data": {}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def to_request(url):
+    parts = urllib.parse.urlsplit(url)
+    request = {"GET": {"scheme": parts.scheme, "host": parts.netloc}}
+    if parts.path:
+        request["GET"]["filename"] = parts.path
+    return request
+
+
+def clicks(request, count, broker_path=None):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        WebUtils(broker_path).make_request(
+            request, headers={"User-Agent": "kodi.tv"}
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name, timings):
+    print("{0:<10} median {1:8.1f} ms   mean {2:8.1f} ms   max {3:8.1f} ms".format(
+        name, statistics.median(timings), statistics.mean(timings),
+        max(timings)
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=20)
+    parser.add_argument("--url", default="https://graphql-telia.t6a.net/graphql")
+    parser.add_argument("--local", action="store_true",
+                        help="target a local HTTP server instead of --url")
+    args = parser.parse_args()
+
+    if not broker.is_supported():
+        sys.exit("Unix sockets are not supported on this platform")
+
+    if args.local:
+        local_server = ThreadingHTTPServer(("127.0.0.1", 0), LocalHandler)
+        threading.Thread(target=local_server.serve_forever, daemon=True).start()
+        args.url = "http://127.0.0.1:{0}/graphql".format(
+            local_server.server_address[1])
+    request = to_request(args.url)
+
+    with tempfile.TemporaryDirectory() as profile:
+        broker_path = broker.socket_path(profile)
+        broker_server = broker.BrokerServer(broker_path)
+        threading.Thread(target=broker_server.serve_forever, daemon=True).start()
+
+        direct = clicks(request, args.clicks)
+        # Warm the broker connection before timing, as the service would
+        clicks(request, 1, broker_path)
+        brokered = clicks(request, args.clicks, broker_path)
+
+        broker_server.shutdown()
+        broker_server.server_close()
+
+    print("{0} clicks against {1}".format(args.clicks, args.url))
+    report("direct", direct)
+    report("broker", brokered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+"""Canned Telia responses for running the add-on offline.
+
+A fixture directory holds one JSON file per request:
+
+    {"request": {"method": ..., "url": ..., "headers": {...},
+                 "payload": ...},
+     "response": {"status": 200, "headers": {...}, "body": ...}}
+
+Responses that aren't JSON are kept as "text" instead of "body".
+FixtureSet answers requests from such a directory. generate() writes a
+synthetic set of realistic size, with 500-item panels and a 150-channel
+EPG, for the pages, routes and settings benchmarks/routes.py uses.
+
+    python benchmarks/fixtures.py DIR [--panel-items N] [--channels N]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from resources.lib.operations import OPERATIONS  # noqa: E402
+
+# Variables that follow the clock; a recording is replayed whatever they are
+VOLATILE_VARIABLES = ("timestamp",)
+
+# The hosts of resources.lib.api, which can't be imported without Kodi
+OTT_HOST = "ottapi.prod.telia.net"
+TV_CLIENT_HOST = "tvclientgateway-telia.clientapi-prod.live.tv.telia.net"
+STREAMING_HOST = "streaminggateway-telia.clientapi-prod.live.tv.telia.net"
+
+IMAGE = "https://img-cdn.telia.example/{0}/{1}%2Ejpg"
+GENRES = ("Drama", "Komedi", "Action", "Thriller", "Dokumentär", "Barn")
+WORDS = (
+    "sommar", "natten", "hemlighet", "resan", "staden", "vinter", "ön",
+    "kärlek", "jakten", "sista", "bröderna", "ljuset", "skuggan", "havet"
+)
+
+
+def graphql_call(url, payload=None):
+    if isinstance(payload, dict) and "operationName" in payload:
+        return (payload["operationName"], payload.get("variables") or {})
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+    if "operationName" not in query:
+        return None
+    return (
+        query["operationName"][0],
+        json.loads(query.get("variables", ["{}"])[0])
+    )
+
+
+def fixture_key(method, url, payload=None):
+    # Hosts are left out, so recordings replay against any stand-in
+    call = graphql_call(url, payload)
+    if call is None:
+        return "{0} {1}".format(method, urllib.parse.urlsplit(url).path)
+    (name, variables) = call
+    variables = {
+        key: value for (key, value) in variables.items()
+        if key not in VOLATILE_VARIABLES
+    }
+    return "graphql {0} {1}".format(
+        name, json.dumps(variables, sort_keys=True)
+    )
+
+
+def missing(key):
+    return {
+        "status": 404,
+        "headers": {"Content-Type": "application/json"},
+        "body": {"errors": [{"message": "No fixture for " + key}]}
+    }
+
+
+class FixtureSet():
+
+    def __init__(self, directory):
+        self.responses = {}
+        self.misses = []
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(directory, filename), "r") as json_file:
+                fixture = json.load(json_file)
+            request = fixture["request"]
+            response = fixture["response"]
+            payload = request.get("payload")
+            if isinstance(payload, list) and isinstance(
+                response.get("body"), list
+            ):
+                # Recorded batches answer each of their queries
+                for (item, body) in zip(payload, response["body"]):
+                    self.add(
+                        fixture_key("GET", request["url"], item),
+                        dict(response, body=body)
+                    )
+                continue
+            self.add(
+                fixture_key(request["method"], request["url"], payload),
+                response
+            )
+
+    def add(self, key, response):
+        # Later recordings of the same request win, except a revalidation
+        # answer, which has no body to replay
+        previous = self.responses.get(key)
+        if (response["status"] == 304 and previous is not None and
+                200 <= previous["status"] < 300):
+            return
+        self.responses[key] = response
+
+    def answer(self, method, url, payload=None):
+        if isinstance(payload, list):
+            # Batches are answered query by query
+            answers = [self.answer("GET", url, item) for item in payload]
+            for answer in answers:
+                if answer["status"] != 200:
+                    return answer
+            return {
+                "status": 200,
+                "headers": {"Content-Type": "application/json"},
+                "body": [answer["body"] for answer in answers]
+            }
+
+        key = fixture_key(method, url, payload)
+        try:
+            return self.responses[key]
+        except KeyError:
+            self.misses.append(key)
+            return missing(key)
+
+    @staticmethod
+    def content(answer):
+        if "text" in answer:
+            return answer["text"].encode("utf-8")
+        return json.dumps(answer["body"]).encode("utf-8")
+
+    def response(self, method, url, payload=None):
+        # Stands in for what requests would have returned
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        answer = self.answer(method, url, payload)
+        response = requests.Response()
+        response.status_code = answer["status"]
+        response.headers = CaseInsensitiveDict(answer["headers"])
+        response.encoding = "utf-8"
+        response.url = url
+        response._content = self.content(answer)
+        return response
+
+
+class FixtureWriter():
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.count = 0
+
+    def write(self, name, method, url, payload, body, status=200):
+        fixture = {
+            "request": {
+                "method": method,
+                "url": url,
+                "headers": {"User-Agent": "kodi.tv"},
+                "payload": payload
+            },
+            "response": {
+                "status": status,
+                "headers": {"Content-Type": "application/json"},
+                "body": body
+            }
+        }
+        self.count += 1
+        filepath = os.path.join(
+            self.directory, "{0:05d}-{1}.json".format(self.count, name)
+        )
+        with open(filepath, "w") as json_file:
+            json.dump(fixture, json_file)
+
+    def graphql(self, name, variables, data):
+        (request, payload) = OPERATIONS[name].request(variables)
+        (method, request) = list(request.items())[0]
+        self.write(name, method, request["url"], payload, {"data": data})
+
+
+def title(index):
+    return " ".join(
+        WORDS[(index*(position + 3)) % len(WORDS)].capitalize()
+        if position == 0 else WORDS[(index*(position + 3)) % len(WORDS)]
+        for position in range(1 + index % 3)
+    ) + " {0}".format(index)
+
+
+def images(media_id, *names):
+    return {name: {"source": IMAGE.format(media_id, name)} for name in names}
+
+
+def media(index, prefix="m", typename="Movie"):
+    media_id = "{0}{1}".format(prefix, index)
+    item = {
+        "__typename": typename,
+        "id": media_id,
+        "title": title(index),
+        "genre": GENRES[index % len(GENRES)],
+        "description": "En kort beskrivning av {0}.".format(title(index)),
+        "descriptionLong": " ".join(
+            WORDS[(index + word) % len(WORDS)] for word in range(60)
+        ).capitalize() + ".",
+        "images": images(media_id, "showcard2x3", "showcard16x9"),
+        "ratings": {"imdb": {
+            "url": "https://www.imdb.com/title/tt{0:07d}".format(index),
+            "readableScore": "{0}.{1}".format(5 + index % 4, index % 10)
+        }},
+        "duration": {"readableShort": "1 tim {0} min".format(index % 60)},
+        "price": None
+    }
+    if index % 7 == 0:
+        item["price"] = {"readable": "{0} kr".format(29 + index % 3*10)}
+    return item
+
+
+def panel_items(count, start=0):
+    return [
+        {"media": media(
+            index, *(("s", "Series") if index % 4 == 0 else ("m", "Movie"))
+        )}
+        for index in range(start, start + count)
+    ]
+
+
+def windows(count, limit, total_count=True, waves_after=8):
+    # _get_windows may ask for a wave reaching past the end
+    for offset in range(0, count + waves_after*limit, limit):
+        page_info = {"hasNextPage": offset + limit < count}
+        if total_count:
+            page_info["totalCount"] = count
+        yield (offset, min(limit, max(0, count - offset)), page_info)
+
+
+def generate(directory, panel_items_count=500, channels=150, seasons=8,
+             episodes=12, programs=40, search_results=200, query="the",
+             movies_per_page=50, channels_per_page=25, search_limit=50,
+             total_count=True):
+    writer = FixtureWriter(directory)
+    now = int(time.time()*1000)
+    half_hour = 1800*1000
+
+    writer.graphql("getMainMenu", {}, {"mainMenu": {"items": [
+        {"id": "start", "name": "Start"},
+        {"id": "movies", "name": "Filmer"},
+        {"id": "series", "name": "Serier"},
+        {"id": "epg", "name": "TV-guide"}
+    ]}})
+
+    panels = [
+        ("SelectionMediaPanel", "selectionMediaContent", "movies", "Filmer"),
+        ("MediaPanel", "mediaContent", "series", "Serier"),
+        ("MediaPanel", "mediaContent", "new", "Nytt"),
+        ("RentalsPanel", "rentalsContent", "rentals", "Hyrfilmer"),
+        ("MyListPanel", "myListContent", "mylist", "Min lista"),
+        ("ContinueWatchingPanel", "continueWatchingContent", "continue",
+         "Fortsätt titta")
+    ]
+    for page_id in ("start", "movies", "series"):
+        writer.graphql("getPage", {"id": page_id}, {"page": {"pagePanels": {
+            "items": [{
+                "__typename": typename,
+                "id": panel_id,
+                "title": panel_title,
+                content_key: {
+                    "items": panel_items(20, position*20),
+                    "pageInfo": {"hasNextPage": True}
+                }
+            } for (position, (typename, content_key, panel_id, panel_title))
+                in enumerate(panels)]
+        }}})
+
+    for panel_id in ("movies", "series"):
+        for (offset, count, page_info) in windows(
+            panel_items_count, movies_per_page, total_count
+        ):
+            writer.graphql("getPanel", {
+                "id": panel_id,
+                "config": {
+                    "limit": movies_per_page,
+                    "offset": offset,
+                    "sort": {"key": "TITLE", "order": "ASC"}
+                }
+            }, {"panel": {"selectionMediaContent": {
+                "items": panel_items(count, offset),
+                "pageInfo": page_info
+            }}})
+
+    for (offset, count, page_info) in windows(
+        search_results, search_limit, total_count
+    ):
+        writer.graphql("search", {
+            "q": query,
+            "limit": search_limit,
+            "offset": offset,
+            "searchRentalsType": "ALL",
+            "searchSubscriptionType": "IN_SUBSCRIPTION"
+        }, {"search2": {
+            "searchItems": panel_items(count, 10000 + offset),
+            "pageInfo": page_info
+        }})
+
+    season_links = [{
+        "id": "s1-season-{0}".format(season),
+        "seasonNumber": {"number": season},
+        "descriptionLong": "Säsong {0} av serien.".format(season)
+    } for season in range(1, seasons + 1)]
+
+    def episode(season, number):
+        item = media(season*100 + number)
+        item.update({
+            "__typename": "Episode",
+            "id": "m1-{0}-{1}".format(season, number),
+            "episodeNumber": {"readable": "S{0} E{1}".format(season, number)},
+            "availableFrom": {
+                "timestamp": now - (seasons - season)*30*86400000
+                - (episodes - number)*7*86400000
+            }
+        })
+        return item
+
+    suggested = episode(1, 1)
+    suggested["series"] = {"seasonLinks": {"items": season_links}}
+    writer.graphql("getSeries", {"id": "s1"}, {"series": {
+        "id": "s1",
+        "title": title(1),
+        "images": images("s1", "backdrop16x9", "showcard2x3"),
+        "suggestedEpisode": suggested
+    }})
+    for season in range(1, seasons + 1):
+        for order in ("ASC", "DESC"):
+            numbers = range(1, episodes + 1)
+            writer.graphql("getSeason", {
+                "seasonId": "s1-season-{0}".format(season),
+                "sort": {"order": order}
+            }, {"season": {"episodes": {"episodeItems": [
+                episode(season, number) for number in (
+                    numbers if order == "ASC" else reversed(numbers)
+                )
+            ]}}})
+
+    def program(channel, start, length):
+        item = media(channel*1000 + start // half_hour % 1000)
+        item["images"] = images(item["id"], "showcard2x3", "showcard16x9")
+        return {
+            "startTime": {"timestamp": start},
+            "endTime": {"timestamp": start + length},
+            "media": item
+        }
+
+    current = now - now % half_hour
+    for (offset, count, page_info) in windows(
+        channels, channels_per_page, total_count
+    ):
+        writer.graphql("getTvChannels", {
+            "timestamp": current,
+            "limit": channels_per_page,
+            "programLimit": 3,
+            "offset": offset
+        }, {"channels": {
+            "channelItems": [{
+                "id": "ch{0}".format(channel),
+                "name": "Kanal {0}".format(channel),
+                "icons": {"dark": {"source": IMAGE.format(
+                    "ch{0}".format(channel), "logo"
+                )}},
+                "programs": {"programItems": [
+                    program(channel, current + slot*half_hour, half_hour)
+                    for slot in range(3)
+                ]}
+            } for channel in range(offset, offset + count)],
+            "pageInfo": page_info
+        }})
+
+    day_start = now - now % 86400000
+    length = 86400000 // programs
+    for channel in range(min(channels, 5)):
+        writer.graphql("getTvChannel", {
+            "timestamp": day_start,
+            "offset": 0,
+            "id": "ch{0}".format(channel)
+        }, {"channel": {"programs": {"programItems": [
+            program(channel, day_start + slot*length, length)
+            for slot in range(programs)
+        ]}}})
+
+    writer.write(
+        "provision", "POST", "https://{0}/tvclientgateway/rest/secure/v1/"
+        "provision".format(TV_CLIENT_HOST), None, {}
+    )
+    for media_id in ("m1", "m2"):
+        writer.write(
+            "streamingticket", "POST", "https://{0}/streaminggateway/rest/"
+            "secure/v2/streamingticket/MEDIA/{1}?country=SE".format(
+                STREAMING_HOST, media_id
+            ), None, {"streams": [{
+                "url": "https://vod.telia.example/{0}/manifest.mpd".format(
+                    media_id
+                ),
+                "drm": {
+                    "licenseUrl": "https://drm.telia.example/widevine",
+                    "headers": {"X-AxDRM-Message": "benchmark"}
+                }
+            }]}
+        )
+    writer.write(
+        "streamingticket", "DELETE", "https://{0}/streaminggateway/rest/"
+        "secure/v2/streamingticket/CHANNEL/18".format(STREAMING_HOST),
+        {}, {}
+    )
+    token_data = {
+        "accessToken": "benchmark",
+        "refreshToken": "benchmark",
+        "validTo": "2999-01-01T00:00:00.000+00:00"
+    }
+    for (name, path) in (("login", "login"), ("refresh", "login/refresh")):
+        writer.write(
+            name, "POST", "https://{0}/web/se/logingateway/rest/v1/{1}".format(
+                OTT_HOST, path
+            ), None, token_data
+        )
+    writer.write(
+        "provision", "POST", "https://{0}/web/se/tvclientgateway/rest/secure/"
+        "v1/provision".format(OTT_HOST), None, {}
+    )
+    return writer.count
+
+
+# Opens a benchmark driver as Kodi would invoke the plugin with query
+DRIVER_HEADER = """
+import sys
+sys.path[:0] = {paths!r}
+sys.argv = ["plugin://plugin.video.teliaplay-se/", "1", "?" + {query!r}]
+"""
+
+
+def write_userdata(home):
+    profile = os.path.join(home, "addon_data", "plugin.video.teliaplay-se")
+    os.makedirs(profile)
+    # A token that never expires keeps the routes away from the login
+    userdata = {"": {
+        "bootUUID": "benchmark",
+        "deviceUUID": "WEB-benchmark",
+        "tokenData": {
+            "accessToken": "benchmark",
+            "refreshToken": "benchmark",
+            "validTo": "2999-01-01T00:00:00.000+00:00"
+        }
+    }}
+    with open(os.path.join(profile, "userdata.json"), "w") as data_file:
+        json.dump(userdata, data_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--panel-items", type=int, default=500)
+    parser.add_argument("--channels", type=int, default=150)
+    parser.add_argument("--query", default="the")
+    args = parser.parse_args()
+
+    count = generate(
+        args.directory, args.panel_items, args.channels, query=args.query
+    )
+    print("{0} fixtures written to {1}".format(count, args.directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Measure module import cost of every plugin route.
+
+Each route runs in a fresh interpreter under ``python -X importtime`` with
+the stub xbmc modules from benchmarks/stubs and the network switched off,
+so the numbers show what a cold plugin invocation spends on imports.
+
+    python benchmarks/importtime.py [--runs N] [--top N]
+"""
+import os
+import sys
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+STUBS = os.path.join(BENCHMARKS, "stubs")
+
+sys.path.insert(0, BENCHMARKS)
+import fixtures  # noqa: E402
+
+ROUTES = {
+    "main": "",
+    "page": "menu=page&pageId=start",
+    "submenu": "menu=page&pageId=start&mode=Filmer",
+    "panel": "menu=panel&panelId=panel&page=0",
+    "series": "menu=series&seriesId=s1",
+    "season": "menu=season&seasonId=1",
+    "channels": "menu=page&pageId=epg",
+    "programs": "menu=page&pageId=epg&channelId=1&dayOffset=0",
+    "history": "menu=history",
+    "play": "menu=play&streamId=m1&streamType=vod",
+}
+
+DRIVER = fixtures.DRIVER_HEADER + """from resources.lib import webutils
+
+def offline(self, request, headers=None, payload=None):
+    raise webutils.WebException("offline")
+
+webutils.WebUtils.make_request = offline
+from resources.lib import plugin
+try:
+    plugin.run()
+except Exception:
+    pass
+"""
+
+
+def import_times(query, home):
+    env = dict(os.environ, KODI_STUB_HOME=home)
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         DRIVER.format(paths=[STUBS, ROOT], query=query)],
+        env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True
+    ).stderr
+
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        (_, cumulative, name) = line[len("import time:"):].split("|")
+        # Nested imports are indented; their time is in the parent's total
+        if not name.startswith("  "):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=3)
+    args = parser.parse_args()
+
+    print("{0:<10} {1:>10}   {2}".format("route", "imports", "heaviest"))
+    for (route, query) in ROUTES.items():
+        totals = []
+        heaviest = {}
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as home:
+                fixtures.write_userdata(home)
+                modules = import_times(query, home)
+            totals.append(sum(modules.values()))
+            for (name, cumulative) in modules.items():
+                heaviest.setdefault(name, []).append(cumulative)
+
+        top = sorted(
+            heaviest.items(), key=lambda item: -statistics.median(item[1])
+        )[:args.top]
+        print("{0:<10} {1:>7.1f} ms   {2}".format(
+            route, statistics.median(totals) / 1000,
+            ", ".join("{0} {1:.1f}".format(
+                name, statistics.median(times) / 1000) for (name, times) in top)
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Count Kodi ListItem calls per item when rendering a panel.
+
+Uses the stub xbmcgui with every ListItem method wrapped in a counter. The
+legacy builder is MenuList._add_folder_item as it was before labels were
+gathered into a single setInfo call.
+
+    python benchmarks/listitem_calls.py [--items N]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import collections
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "benchmarks", "stubs"), ROOT]
+# The add-on reads its handle from argv, so keep the benchmark's own options
+ARGS = sys.argv[1:]
+sys.argv = ["plugin://plugin.video.teliaplay-se/", "1", ""]
+os.environ.setdefault("KODI_STUB_HOME", tempfile.mkdtemp())
+
+import xbmcgui  # noqa: E402
+from xbmcgui import ListItem  # noqa: E402
+from resources.lib.kodiutils import get_addon_utils  # noqa: E402
+from resources.lib.menus import MenuList  # noqa: E402
+
+CALLS = collections.Counter()
+
+
+def counted(name, method):
+    def wrapper(*args, **kwargs):
+        CALLS[name] += 1
+        return method(*args, **kwargs)
+    return wrapper
+
+
+for name in ("__init__", "setArt", "setInfo", "setProperty",
+             "addContextMenuItems"):
+    setattr(xbmcgui.ListItem, name, counted(name, getattr(ListItem, name)))
+
+
+def legacy(self, items, label, url, icon=None, fanart=None, sort_title="",
+           genre="", info="", datetime_str="", duration=0, is_folder=True,
+           is_playable=False, context_menu_items=None, offscreen=True,
+           imdb="", rating="", title=""):
+    if not fanart:
+        fanart = os.path.join(self.addon.resources, "fanart.jpg")
+    if not icon:
+        icon = os.path.join(self.addon.media, "telia_logo.png")
+    list_item = ListItem(label=label, offscreen=offscreen)
+    list_item.setArt({"thumb": icon, "fanart": fanart})
+    list_item.setInfo("video", {"title": title or label,
+                                "sorttitle": sort_title})
+    list_item.setProperty("IsPlayable", "true" if is_playable else "false")
+    if datetime_str:
+        list_item.setInfo("video", {"dateadded": datetime_str})
+    if duration:
+        list_item.setInfo("video", {"duration": duration})
+    if info:
+        list_item.setInfo("video", {"plot": info})
+    if imdb:
+        list_item.setInfo("video", {"imdbnumber": imdb})
+    if rating:
+        list_item.setInfo("video", {"rating": rating})
+    if genre:
+        list_item.setInfo("video", {"genre": genre})
+    if context_menu_items:
+        list_item.addContextMenuItems(context_menu_items)
+    items.append((url, list_item, is_folder))
+
+
+def render(menu_list, add_folder_item, count):
+    items = []
+    for index in range(count):
+        add_folder_item(
+            menu_list, items, "Title {0}".format(index), "plugin://x",
+            info="Plot", genre="Drama", imdb="tt0000001", rating="7.1",
+            duration=5400, datetime_str="2024-01-01 20:00:00",
+            is_playable=True, is_folder=False, title="Title",
+            context_menu_items=[("Add", "RunPlugin(plugin://x)")]
+        )
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200)
+    args = parser.parse_args(ARGS)
+
+    menu_list = MenuList.__new__(MenuList)
+    menu_list.addon = get_addon_utils()
+    for (name, add_folder_item) in (("legacy", legacy),
+                                    ("current", MenuList._add_folder_item)):
+        CALLS.clear()
+        start = time.perf_counter()
+        render(menu_list, add_folder_item, args.items)
+        elapsed = (time.perf_counter() - start) * 1000
+        per_item = ", ".join(
+            "{0} {1:g}".format(call, CALLS[call] / args.items)
+            for call in sorted(CALLS)
+        )
+        print("{0:<8} {1:4.1f} calls/item ({2})  {3:.1f} ms".format(
+            name, sum(CALLS.values()) / args.items, per_item, elapsed
+        ))
+
+
+if __name__ == "__main__":
+    main()
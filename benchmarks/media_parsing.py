@@ -0,0 +1,119 @@
+"""Time turning panel media into list fields, per item.
+
+The legacy parser is the per-field try/except extraction every menu used
+to repeat; it is compared with resources.lib.media.parse_items on a full
+panel and on a sparse one where most optional fields are missing.
+
+    python benchmarks/media_parsing.py [--items N] [--number N]
+"""
+import os
+import sys
+import timeit
+import argparse
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resources.lib.media import parse_items  # noqa: E402
+from resources.lib.timeutils import TimezoneStamps  # noqa: E402
+
+IMAGE = "https://img.example.com/{0}/{1}%2Ejpg"
+
+
+def full_media(index):
+    media = {
+        "__typename": "Movie" if index % 3 else "Series",
+        "id": ("m{0}" if index % 3 else "s{0}").format(index),
+        "title": "Title {0}".format(index),
+        "genre": "Drama",
+        "description": "Short description",
+        "descriptionLong": "A longer description " * 10,
+        "images": {
+            "showcard2x3": {"source": IMAGE.format(index, "2x3")},
+            "showcard16x9": {"source": IMAGE.format(index, "16x9")}
+        },
+        "ratings": {"imdb": {
+            "url": "https://www.imdb.com/title/tt{0:07d}".format(index),
+            "readableScore": "7.{0}".format(index % 10)
+        }},
+        "duration": {"readableShort": "1 tim {0} min".format(index % 60)}
+    }
+    if index % 5 == 0:
+        media["price"] = {"readable": "49 kr"}
+    return {"media": media}
+
+
+def sparse_media(index):
+    return {"media": {
+        "id": "m{0}".format(index), "title": "Title {0}".format(index),
+        "images": None, "ratings": None, "price": None
+    }}
+
+
+def legacy(items):
+    parsed = []
+    for item in items:
+        media = item["media"]
+        try:
+            icon = urllib.parse.unquote(media["images"]["showcard2x3"]["source"])
+        except Exception:
+            icon = None
+        try:
+            fanart = urllib.parse.unquote(
+                media["images"]["showcard16x9"]["source"]
+            )
+        except Exception:
+            fanart = None
+        try:
+            description = media["descriptionLong"]
+        except Exception:
+            description = ""
+        try:
+            genre = media["genre"]
+        except Exception:
+            genre = ""
+        try:
+            imdb = media["ratings"]["imdb"]["url"].split("/")[-1]
+        except Exception:
+            imdb = ""
+        try:
+            rating = media["ratings"]["imdb"]["readableScore"]
+        except Exception:
+            rating = ""
+        try:
+            duration = TimezoneStamps.convert_to_seconds(
+                media["duration"]["readableShort"]
+            )
+        except Exception:
+            duration = 0
+        try:
+            price = media["price"]["readable"]
+        except Exception:
+            price = None
+        parsed.append((
+            media["id"], media["title"], media["id"].startswith("s"), icon,
+            fanart, description, genre, imdb, rating, duration, price
+        ))
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    for (name, build) in (("full", full_media), ("sparse", sparse_media)):
+        items = [build(index) for index in range(args.items)]
+        for (parser_name, parse) in (("legacy", legacy),
+                                     ("media", parse_items)):
+            seconds = min(timeit.repeat(
+                lambda: parse(items), number=args.number, repeat=5
+            ))
+            print("{0:<7} {1:<7} {2:6.2f} us/item".format(
+                name, parser_name, seconds / args.number / args.items * 1e6
+            ))
+
+
+if __name__ == "__main__":
+    main()
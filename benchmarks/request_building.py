@@ -0,0 +1,89 @@
+"""Time building one GraphQL request the old way and through the registry.
+
+The legacy builder is the nested request dict plus header dict that every
+TeliaPlay method used to assemble, encoded by WebUtils.extract_url.
+
+    python benchmarks/request_building.py [--number N]
+"""
+import os
+import sys
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resources.lib.operations import OPERATIONS  # noqa: E402
+from resources.lib.webutils import WebUtils  # noqa: E402
+
+WEB_UTILS = WebUtils()
+OPERATION = OPERATIONS["getPanel"]
+QUERY_HEADERS = {
+    "User-Agent": "kodi.tv",
+    "client-name": "web",
+    "tv-client-boot-id": "boot",
+    "x-country": "SE"
+}
+
+
+def variables(panel_id):
+    return {
+        "id": panel_id,
+        "config": {
+            "limit": 50,
+            "offset": 100,
+            "sort": {"key": "TITLE", "order": "ASC"}
+        }
+    }
+
+
+def legacy(panel_id):
+    request = {
+        "GET": {
+            "scheme": "https",
+            "host": "graphql-telia.t6a.net",
+            "filename": "/graphql",
+            "query": {
+                "operationName": "getPanel",
+                "variables": variables(panel_id),
+                "extensions": {
+                    "persistedQuery": {
+                        "version": 1,
+                        "sha256Hash": OPERATION.sha256_hash
+                    }
+                }
+            }
+        }
+    }
+    headers = {
+        "User-Agent": "kodi.tv",
+        "client-name": "web",
+        "tv-client-boot-id": "boot",
+        "Authorization": "Bearer " + "token",
+        "x-country": "SE"
+    }
+    return (WEB_UTILS.extract_url(request), headers)
+
+
+def registry(panel_id):
+    (request, _) = OPERATION.request(variables(panel_id))
+    headers = dict(QUERY_HEADERS)
+    headers["Authorization"] = "Bearer " + "token"
+    return (WEB_UTILS.extract_url(request), headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    for (name, builder) in (("legacy", legacy), ("registry", registry)):
+        best = min(timeit.repeat(
+            lambda: builder("panel-id"), number=args.number, repeat=5
+        ))
+        print("{0:<10} {1:6.2f} us per request".format(
+            name, best / args.number * 1e6
+        ))
+
+
+if __name__ == "__main__":
+    main()
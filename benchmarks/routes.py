@@ -0,0 +1,170 @@
+"""Time every plugin route end to end against recorded fixtures.
+
+Each route runs Router(params).main_menu() in a fresh interpreter with the
+stub xbmc modules from benchmarks/stubs and WebUtils answering from a
+fixture directory, see benchmarks/fixtures.py. The cold run starts from an
+empty add-on profile, the warm run is a second invocation on the profile the
+cold run left behind. Network calls are shown as the requests made before
+the listing was handed to Kodi plus those made after it, mostly by
+background threads. Peak memory comes from a separate tracemalloc run, so
+it doesn't slow down the timed one.
+
+    python benchmarks/routes.py [--runs N] [--route NAME] [--fixtures DIR]
+        [--panel-items N] [--channels N]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+STUBS = os.path.join(BENCHMARKS, "stubs")
+
+sys.path.insert(0, BENCHMARKS)
+import fixtures  # noqa: E402
+
+QUERY = "the"
+
+ROUTES = {
+    "main": "",
+    "page": "menu=page&pageId=start",
+    "submenu": "menu=page&pageId=start&mode=Filmer",
+    "panel": "menu=panel&panelId=movies&page=0",
+    "panel-all": "menu=panel&panelId=movies&page=all",
+    "series": "menu=series&seriesId=s1",
+    "season": "menu=season&seasonId=s1-season-1",
+    "episodes": "menu=allEpisodes&seriesId=s1",
+    "channels": "menu=page&pageId=epg",
+    "channels-all": "menu=page&pageId=epg&page=all",
+    "programs": "menu=page&pageId=epg&channelId=ch1&dayOffset=0",
+    "search": "menu=newsearch",
+    "play": "menu=play&streamId=m1&streamType=vod",
+}
+
+DRIVER = fixtures.DRIVER_HEADER + """import json
+import time
+import threading
+import tracemalloc
+from urllib.parse import parse_qsl
+import fixtures
+import xbmcplugin
+from resources.lib import menus, plugin
+from resources.lib.webutils import WebUtils
+
+fixture_set = fixtures.FixtureSet({fixtures_dir!r})
+calls = []
+listed = []
+
+def replay(self, method, url, headers, payload):
+    calls.append(url)
+    return fixture_set.response(method, url, payload)
+
+def end_of_directory(handle, *args, **kwargs):
+    listed.append(len(calls))
+    xbmcplugin.endOfDirectory(handle, *args, **kwargs)
+
+WebUtils._send = replay
+menus.endOfDirectory = end_of_directory
+if {trace!r}:
+    tracemalloc.start()
+error = None
+start = time.perf_counter()
+try:
+    plugin.Router(dict(parse_qsl({query!r}))).main_menu()
+except Exception as exception:
+    # Recordings of a few screens only cover those screens
+    error = repr(exception)
+elapsed = time.perf_counter() - start
+# Playback hands nothing to a directory listing
+foreground = listed[0] if listed else len(calls)
+peak = tracemalloc.get_traced_memory()[1] if {trace!r} else 0
+for thread in threading.enumerate():
+    if thread is not threading.main_thread():
+        thread.join()
+print(json.dumps({{
+    "ms": elapsed*1000, "calls": foreground,
+    "background": len(calls) - foreground, "peak": peak,
+    "items": len(xbmcplugin.directory), "misses": fixture_set.misses,
+    "error": error
+}}))
+"""
+
+
+def run_route(query, home, fixtures_dir, trace=False):
+    env = dict(os.environ, KODI_STUB_HOME=home, KODI_STUB_INPUT=QUERY)
+    stdout = subprocess.run(
+        [sys.executable, "-c", DRIVER.format(
+            paths=[STUBS, ROOT, BENCHMARKS], query=query,
+            fixtures_dir=fixtures_dir, trace=trace
+        )],
+        env=env, stdout=subprocess.PIPE, universal_newlines=True, check=True
+    ).stdout
+    return json.loads(stdout.splitlines()[-1])
+
+
+def cold_and_warm(query, fixtures_dir, trace=False):
+    with tempfile.TemporaryDirectory() as home:
+        fixtures.write_userdata(home)
+        return [run_route(query, home, fixtures_dir, trace) for _ in range(2)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--route", choices=sorted(ROUTES))
+    parser.add_argument("--fixtures",
+                        help="directory of recorded fixtures to replay")
+    parser.add_argument("--panel-items", type=int, default=500)
+    parser.add_argument("--channels", type=int, default=150)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as generated:
+        fixtures_dir = args.fixtures
+        if fixtures_dir is None:
+            fixtures_dir = generated
+            fixtures.generate(
+                generated, args.panel_items, args.channels, query=QUERY
+            )
+
+        print((
+            "{0:<13} {1:>9} {2:>9} {3:>9} {4:>9} {5:>9} {6:>9} {7:>6}"
+        ).format(
+            "route", "cold ms", "warm ms", "cold net", "warm net",
+            "cold kB", "warm kB", "items"
+        ))
+        for (route, query) in ROUTES.items():
+            if args.route and route != args.route:
+                continue
+            timed = [
+                cold_and_warm(query, fixtures_dir) for _ in range(args.runs)
+            ]
+            traced = cold_and_warm(query, fixtures_dir, trace=True)
+            (cold, warm) = timed[-1]
+            for key in sorted(set(cold["misses"] + warm["misses"])):
+                print("  no fixture: " + key, file=sys.stderr)
+            if cold["error"] or warm["error"]:
+                print("{0:<13} failed: {1}".format(
+                    route, cold["error"] or warm["error"]
+                ))
+                continue
+
+            print(
+                "{0:<13} {1:>9.1f} {2:>9.1f} {3:>5}+{4:<3} {5:>5}+{6:<3} "
+                "{7:>9.0f} {8:>9.0f} {9:>6}".format(
+                    route,
+                    statistics.median(run[0]["ms"] for run in timed),
+                    statistics.median(run[1]["ms"] for run in timed),
+                    cold["calls"], cold["background"],
+                    warm["calls"], warm["background"],
+                    traced[0]["peak"] / 1000, traced[1]["peak"] / 1000,
+                    cold["items"]
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
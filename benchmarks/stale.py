@@ -0,0 +1,158 @@
+"""Time a visit to an expired listing with and without stale serving.
+
+A local stand-in for the GraphQL host answers getMainMenu after an
+injected delay. The main menu is cached, expired and visited again, once
+waiting for the refresh and once served stale while a background thread
+refreshes it.
+
+Before timing, the background refresh is checked against a stand-in that
+fails: with a 502 carrying JSON, with a 502 error page and by dropping the
+connection. Each visit has to keep serving the last good copy, and the
+first refresh that succeeds has to replace it.
+
+    python benchmarks/stale.py [--latency MS]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "benchmarks", "stubs"), ROOT]
+# The add-on reads its handle from argv, so keep the benchmark's own options
+ARGS = sys.argv[1:]
+sys.argv = ["plugin://plugin.video.teliaplay-se/", "1", ""]
+os.environ.setdefault("KODI_STUB_HOME", tempfile.mkdtemp())
+
+from resources.lib.api import TeliaPlay  # noqa: E402
+from resources.lib.operations import GRAPHQL_HOST  # noqa: E402
+from resources.lib.webutils import WebUtils  # noqa: E402
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.round_trips += 1
+        time.sleep(self.server.latency)
+        if self.server.failure == "drop":
+            self.close_connection = True
+            return
+        if self.server.failure == "json":
+            self.reply(502, "application/json", {"message": "Bad gateway"})
+        elif self.server.failure == "html":
+            self.reply(502, "text/html", "<html>Bad gateway</html>")
+        else:
+            self.reply(200, "application/json", {"data": {"mainMenu": {
+                "items": [{"id": "start", "version": self.server.version}]
+            }}})
+
+    def reply(self, status, content_type, body):
+        if content_type == "application/json":
+            body = json.dumps(body)
+        content = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def new_telia_play(profile):
+    telia_play = TeliaPlay({
+        "bootUUID": "benchmark", "deviceUUID": "WEB-benchmark",
+        "tokenData": {"accessToken": "benchmark"}
+    })
+    # Start from an empty cache
+    telia_play.response_cache.cache_path = profile
+    return telia_play
+
+
+def expire(telia_play):
+    cache_path = telia_play.response_cache.cache_path
+    for filename in os.listdir(cache_path):
+        filepath = os.path.join(cache_path, filename)
+        with open(filepath, "r") as cache_file:
+            entry = json.load(cache_file)
+        entry["timestamp"] = 0
+        with open(filepath, "w") as cache_file:
+            json.dump(entry, cache_file)
+
+
+def wait_for_refresh():
+    for thread in threading.enumerate():
+        if thread is not threading.main_thread() and not thread.daemon:
+            thread.join()
+
+
+def check(server):
+    # A failing refresh must never replace the copy that is served stale
+    server.latency = 0
+    for failure in ("json", "html", "drop"):
+        with tempfile.TemporaryDirectory() as profile:
+            telia_play = new_telia_play(profile)
+            server.failure = None
+            server.version = 1
+            good = telia_play.get_main_menu(stale=True)
+            expire(telia_play)
+
+            server.failure = failure
+            server.version = 2
+            for _ in range(2):
+                server.round_trips = 0
+                assert telia_play.get_main_menu(stale=True) == good
+                wait_for_refresh()
+                # The expired copy is kept as it was, so it's tried again
+                assert server.round_trips == 1
+
+            server.failure = None
+            assert telia_play.get_main_menu(stale=True) == good
+            wait_for_refresh()
+            assert telia_play.get_main_menu(stale=True)[0]["version"] == 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=50,
+                        help="injected server latency in milliseconds")
+    args = parser.parse_args(ARGS)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.round_trips = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Send everything meant for the GraphQL host to the stand-in
+    base_url = "http://127.0.0.1:{0}".format(server.server_address[1])
+    extract_url = WebUtils.extract_url
+    WebUtils.extract_url = lambda self, request: extract_url(
+        self, request).replace("https://" + GRAPHQL_HOST, base_url)
+
+    check(server)
+    server.latency = args.latency / 1000
+    server.failure = None
+
+    for stale in (False, True):
+        with tempfile.TemporaryDirectory() as profile:
+            telia_play = new_telia_play(profile)
+            telia_play.get_main_menu(stale=stale)
+            expire(telia_play)
+            start = time.perf_counter()
+            telia_play.get_main_menu(stale=stale)
+            elapsed = (time.perf_counter() - start) * 1000
+            wait_for_refresh()
+            print("{0:<10} {1:8.1f} ms".format(
+                "stale" if stale else "blocking", elapsed
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Serve recorded fixtures as a local stand-in for the Telia API.
+
+Answers the GraphQL, logingateway, tvclientgateway and streaminggateway
+requests from a fixture directory, see benchmarks/fixtures.py, after an
+injected delay. Fixtures are recorded with the "Record requests" setting
+into the fixtures folder of the add-on data; without a directory the
+synthetic set is served. Point the add-on at the stand-in with the
+"Stand-in server" setting, e.g. http://192.168.1.10:8090, or with
+KODI_SETTING_standInServer when running on the stub modules.
+
+    python benchmarks/standin.py [FIXTURES_DIR] [--bind ADDRESS]
+        [--port N] [--latency MS] [--jitter MS]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fixtures  # noqa: E402
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.replay("GET")
+
+    def do_POST(self):
+        self.replay("POST")
+
+    def do_DELETE(self):
+        self.replay("DELETE")
+
+    def replay(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+
+        answer = self.server.fixture_set.answer(method, self.path, payload)
+        if answer["status"] == 404:
+            self.log_message("no fixture for %s %s", method, self.path)
+
+        time.sleep(
+            self.server.latency + random.uniform(0, self.server.jitter)
+        )
+        headers = {
+            key.lower(): value for (key, value) in answer["headers"].items()
+        }
+        etag = headers.get("etag")
+        if etag and etag == self.headers.get("If-None-Match"):
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        content = fixtures.FixtureSet.content(answer)
+        self.send_response(answer["status"])
+        for (key, value) in headers.items():
+            # Lengths and encodings are those of the original transfer
+            if key not in ("content-length", "content-encoding",
+                           "transfer-encoding", "connection"):
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet or format.startswith("no fixture"):
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures_dir", nargs="?")
+    parser.add_argument("--bind", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0,
+                        help="injected delay of every reply in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0,
+                        help="random extra delay of up to this many "
+                        "milliseconds")
+    parser.add_argument("--quiet", action="store_true",
+                        help="only log requests without a fixture")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as generated:
+        fixtures_dir = args.fixtures_dir
+        if fixtures_dir is None:
+            fixtures_dir = generated
+            fixtures.generate(generated)
+
+        server = ThreadingHTTPServer((args.bind, args.port), StandInHandler)
+        server.daemon_threads = True
+        server.fixture_set = fixtures.FixtureSet(fixtures_dir)
+        server.latency = args.latency / 1000
+        server.jitter = args.jitter / 1000
+        server.quiet = args.quiet
+        print("Serving {0} fixtures from {1} on http://{2}:{3}".format(
+            len(server.fixture_set.responses), fixtures_dir,
+            *server.server_address[:2]
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+class Helper():
+    inputstream_addon = "inputstream.adaptive"
+
+    def __init__(self, protocol, drm=None):
+        self.protocol = protocol
+        self.drm = drm
+
+    def check_inputstream(self):
+        return True
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+LOGDEBUG = 0
+LOGINFO = 1
+LOGWARNING = 2
+LOGERROR = 3
+
+
+def log(msg, level=LOGDEBUG):
+    if os.environ.get("KODI_STUB_LOG"):
+        print(msg, file=sys.stderr)
+
+
+def sleep(milliseconds):
+    pass
+
+
+def executebuiltin(function, wait=False):
+    pass
+
+
+class Keyboard():
+
+    def __init__(self, line="", heading="", hidden=False):
+        self.text = os.environ.get("KODI_STUB_INPUT", line)
+
+    def doModal(self, autoclose=0):
+        pass
+
+    def isConfirmed(self):
+        return True
+
+    def getText(self):
+        return self.text
+
+
+class Monitor():
+
+    def abortRequested(self):
+        return False
+
+    def waitForAbort(self, timeout=0):
+        time.sleep(timeout)
+        return False
+
+
+class Player():
+
+    def isPlaying(self):
+        return False
+
+    def seekTime(self, seek_time):
+        pass
@@ -0,0 +1,67 @@
+import os
+import xml.etree.ElementTree as ElementTree
+
+ADDON_PATH = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+def _read_defaults():
+    tree = ElementTree.parse(os.path.join(ADDON_PATH, "resources", "settings.xml"))
+    defaults = {}
+    for setting in tree.iter("setting"):
+        default = setting.find("default")
+        text = "" if default is None or default.text is None else default.text
+        defaults[setting.get("id")] = text
+    return defaults
+
+
+def _read_strings():
+    strings = {}
+    string_id = None
+    po_path = os.path.join(ADDON_PATH, "resources", "language",
+                           "resource.language.en_gb", "strings.po")
+    with open(po_path, encoding="utf-8") as po_file:
+        for line in po_file:
+            if line.startswith("msgctxt"):
+                string_id = int(line.split('"#')[1].rstrip('"\n'))
+            elif line.startswith("msgid") and string_id is not None:
+                strings[string_id] = line[7:].rstrip('"\n')
+                string_id = None
+    return strings
+
+
+class Addon():
+    settings = None
+    strings = None
+
+    def __init__(self, id=None):
+        if Addon.settings is None:
+            Addon.settings = _read_defaults()
+            Addon.settings.update({
+                key[len("KODI_SETTING_"):]: value
+                for (key, value) in os.environ.items()
+                if key.startswith("KODI_SETTING_")
+            })
+            Addon.strings = _read_strings()
+
+    def getAddonInfo(self, info_id):
+        return {
+            "id": "plugin.video.teliaplay-se",
+            "name": "Telia Play SE",
+            "path": ADDON_PATH,
+            "profile": "special://profile/addon_data/plugin.video.teliaplay-se/",
+            "icon": os.path.join(ADDON_PATH, "resources", "icon.png"),
+            "version": "0.0.0"
+        }[info_id]
+
+    def getSetting(self, setting_id):
+        return self.settings.get(setting_id, "")
+
+    def setSetting(self, setting_id, value):
+        self.settings[setting_id] = value
+
+    def getLocalizedString(self, string_id):
+        return self.strings.get(string_id, "")
+
+    def openSettings(self):
+        pass
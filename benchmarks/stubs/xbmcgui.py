@@ -0,0 +1,39 @@
+class ListItem():
+
+    def __init__(self, label="", label2="", path="", offscreen=False):
+        self.label = label
+        self.path = path
+        self.art = {}
+        self.info = {}
+        self.properties = {}
+        self.context_menu = []
+
+    def setArt(self, values):
+        self.art.update(values)
+
+    def setInfo(self, info_type, info_labels):
+        self.info.update(info_labels)
+
+    def setProperty(self, key, value):
+        self.properties[key] = value
+
+    def addContextMenuItems(self, items, replaceItems=False):
+        self.context_menu.extend(items)
+
+    def setContentLookup(self, enable):
+        pass
+
+    def setMimeType(self, mimetype):
+        pass
+
+
+class Dialog():
+
+    def textviewer(self, heading, text, usemono=False):
+        pass
+
+    def yesno(self, heading, message, *args, **kwargs):
+        return False
+
+    def numeric(self, type, heading, defaultt=""):
+        return ""
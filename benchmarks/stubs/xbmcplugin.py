@@ -0,0 +1,23 @@
+SORT_METHOD_UNSORTED = 0
+SORT_METHOD_TITLE = 9
+SORT_METHOD_DATEADDED = 21
+
+directory = []
+
+
+def addDirectoryItems(handle, items, totalItems=0):
+    directory.extend(items)
+    return True
+
+
+def addSortMethod(handle, sortMethod, label2Mask=""):
+    pass
+
+
+def endOfDirectory(handle, succeeded=True, updateListing=False,
+                   cacheToDisc=True):
+    pass
+
+
+def setResolvedUrl(handle, succeeded, listitem):
+    directory.append((listitem.path, listitem, False))
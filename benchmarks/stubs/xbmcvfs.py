@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+PROFILE_ROOT = os.environ.get("KODI_STUB_HOME") or tempfile.mkdtemp()
+
+
+def translatePath(path):
+    if path.startswith("special://profile/"):
+        return os.path.join(PROFILE_ROOT, path[len("special://profile/"):])
+    return path
@@ -0,0 +1,128 @@
+"""Count the requests of the Show all and all-channels views per page.
+
+Panels and channel line-ups of a few sizes are generated with
+benchmarks/fixtures.py and fetched through TeliaPlay.get_all_panel and
+get_all_channels, the calls behind panel_all_menu and the all-channels
+view of tv_channels_menu. Waves are the sets of concurrent requests
+that had to wait for the one before.
+
+Responses reporting their totalCount have to be fetched with one request
+per page in two waves on the first visit. Without it the first visit may
+overshoot by less than a wave. A later visit, once the cached windows have
+expired, has to make exactly one request per page in a single wave. The
+script fails otherwise.
+
+    python benchmarks/windows.py
+"""
+import os
+import sys
+import tempfile
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "benchmarks", "stubs"), ROOT,
+                os.path.join(ROOT, "benchmarks")]
+sys.argv = ["plugin://plugin.video.teliaplay-se/", "1", ""]
+os.environ.setdefault("KODI_STUB_HOME", tempfile.mkdtemp())
+
+import fixtures  # noqa: E402
+from resources.lib import api  # noqa: E402
+from resources.lib.api import TeliaPlay  # noqa: E402
+from resources.lib.webutils import WebUtils  # noqa: E402
+
+LIMIT = 25
+SIZES = (10, 25, 30, 75, 150, 500)
+
+
+class WaveCounter(ThreadPoolExecutor):
+    waves = 0
+
+    def map(self, fn, *iterables, **kwargs):
+        iterables = [list(iterable) for iterable in iterables]
+        if iterables[0]:
+            WaveCounter.waves += 1
+        return super().map(fn, *iterables, **kwargs)
+
+
+def visit(telia_play, fixture_set, operation, fetch):
+    calls = []
+    # Requests made outside the pool each wait for an answer on their own
+    main_thread_calls = []
+
+    def replay(self, method, url, headers, payload):
+        calls.append(url)
+        if threading.current_thread() is threading.main_thread():
+            main_thread_calls.append(url)
+        return fixture_set.response(method, url, payload)
+
+    WebUtils._send = replay
+    WaveCounter.waves = 0
+    fetch()
+    if fixture_set.misses:
+        raise AssertionError("No fixture for " + fixture_set.misses[0])
+    # Let the windows expire, as they would between two visits
+    telia_play.response_cache.clear(operation)
+    return (len(calls), WaveCounter.waves + len(main_thread_calls))
+
+
+def main():
+    print("{0:<9} {1:>6} {2:>6} {3:>6} {4:>12} {5:>12}".format(
+        "listing", "total", "items", "pages", "first/waves", "later/waves"
+    ))
+    api.ThreadPoolExecutor = WaveCounter
+    failures = 0
+    for (total_count, size) in itertools.product((True, False), SIZES):
+        with tempfile.TemporaryDirectory() as directory:
+            fixtures_dir = os.path.join(directory, "fixtures")
+            fixtures.generate(
+                fixtures_dir, panel_items_count=size, channels=size,
+                movies_per_page=LIMIT, channels_per_page=LIMIT,
+                total_count=total_count
+            )
+            fixture_set = fixtures.FixtureSet(fixtures_dir)
+            telia_play = TeliaPlay({
+                "bootUUID": "benchmark", "deviceUUID": "WEB-benchmark",
+                "tokenData": {"accessToken": "benchmark"}
+            })
+            telia_play.response_cache.cache_path = directory
+
+            pages = -(-size // LIMIT)
+            for (listing, operation, fetch) in (
+                ("panel", "getPanel", lambda: telia_play.get_all_panel(
+                    "movies", LIMIT, 1000
+                )),
+                ("channels", "getTvChannels",
+                 lambda: telia_play.get_all_channels(0, LIMIT))
+            ):
+                (first, first_waves) = visit(
+                    telia_play, fixture_set, operation, fetch
+                )
+                (later, later_waves) = visit(
+                    telia_play, fixture_set, operation, fetch
+                )
+                print(
+                    "{0:<9} {1:>6} {2:>6} {3:>6} {4:>8}/{5:<3} "
+                    "{6:>8}/{7:<3}".format(
+                        listing, "yes" if total_count else "no", size,
+                        pages, first, first_waves, later, later_waves
+                    )
+                )
+                # Waves double, so without a total the first visit asks for
+                # less than twice the pages there are
+                if total_count:
+                    slow = first != pages or first_waves > min(pages, 2)
+                else:
+                    slow = first >= max(2*pages, 2)
+                if slow or later != pages or later_waves != 1:
+                    failures += 1
+
+    if failures:
+        sys.exit("{0} listings fetched more windows than pages".format(
+            failures
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,23 @@
 import platform
 import uuid
 import json
-from resources.lib.kodiutils import AddonUtils
-from resources.lib.webutils import WebUtils
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from resources.lib import broker
+from resources.lib.cache import ResponseCache
+from resources.lib.diagnostics import RequestLog, RequestRecorder
+from resources.lib.kodiutils import get_addon_utils
+from resources.lib.operations import OPERATIONS, GRAPHQL_HOST
+from resources.lib.webutils import WebUtils, WebException
+
+# Login, token and explore gateways
+OTT_HOST = "ottapi.prod.telia.net"
+TV_CLIENT_HOST = "tvclientgateway-telia.clientapi-prod.live.tv.telia.net"
+STREAMING_HOST = "streaminggateway-telia.clientapi-prod.live.tv.telia.net"
+RENTAL_HOST = "atvse.telia.net"
+API_HOSTS = (
+    GRAPHQL_HOST, OTT_HOST, TV_CLIENT_HOST, STREAMING_HOST, RENTAL_HOST
+)
 
 
 class TeliaException(Exception):
@@ -25,10 +40,28 @@ def error_check(response_json):
         raise TeliaException(response_json["message"])
 
 
+def response_check(response):
+    # Gateways answer errors with JSON that error_check lets through, e.g.
+    # {"message": "Bad gateway"}, which must never be cached as data
+    if not 200 <= response.status_code < 300:
+        try:
+            error_check(response.json())
+        except (ValueError, TypeError):
+            pass
+        raise WebException("HTTP error {0}".format(response.status_code))
+    response_json = response.json()
+    error_check(response_json)
+    return response_json
+
+
 class TeliaPlay():
+    # Upper bound on concurrent requests when fanning out over pages
+    max_workers = 8
+    # Seconds before batching is tried again after the server rejected it
+    batching_retry_interval = 86400
 
     def __init__(self, userdata):
-        addon_utils = AddonUtils()
+        self.addon_utils = get_addon_utils()
 
         self.tv_client_boot_id = userdata["bootUUID"]
         self.device_id = userdata["deviceUUID"]
@@ -37,29 +70,232 @@ class TeliaPlay():
             self.token_data = userdata["tokenData"]
         except KeyError:
             self.token_data = None
-        self.web_utils = WebUtils()
-
-    @property
-    def graphql_hashes(self):
-       return {
-            "getMainMenu":      "f9c1eb6c91def27ee800da2296922d3798a54a8af32f79f25661afb621f1b45d",
-            "search":           "dc9d71dbf7da4f5e5854d9e58e33274379581e07c353f8868cf0d7988c1330de",
-            "getPage":          "9bb1e827055ad3fa20a0a3bf652605f851dcdd34401ae24a3aea4b7b5ae257c4",
-            "getTvChannels":    "a16edac021bc6892ce4a17560cd364c716e1dd086fc4bd2a11e0b031577b3af7",
-            "getTvChannel":     "9af1a674ce9482ca4d89b1bb623a5b69b725cf3c9c6565a93a6c7b04f443891b",
-            "getStorePage":     "e2297df5af0241be95800fbb6758b502808cd00de3e10fdaed865e308e499f4e",
-            "getPanel":         "299f78202946997a0e56f9c4fa4360300f7404fdbe3fe77580bb3003843568b1",
-            "getSeries":        "4bbb65b9bf621902b3f3dc30ae036ff36d9fa57f024f6e3bd10cb55c57f0033d",
-            "getSeason":        "0772731aec9d8b4aecddb3d2dfd1743b32b1db8b0f6d8a03f37bf7ce6c032688",
-            "addToMyList":      "a8369da660da6f45e0eabd53756effcd4c40668f1794a853c298c29e7903c7f9",
-            "removeFromMyList": "630c2f99d817682d4f15d41084cdc2f40dc158a5dae0bd2ab0e815ce268da277"
+        request_log = RequestLog(self.addon_utils.profile)
+        if self.addon_utils.get_setting_as_bool("useBroker"):
+            self.web_utils = WebUtils(
+                broker.socket_path(self.addon_utils.profile), request_log
+            )
+        else:
+            self.web_utils = WebUtils(request_log=request_log)
+        if self.addon_utils.get_setting_as_bool("recordRequests"):
+            self.web_utils.recorder = RequestRecorder(
+                self.addon_utils.profile
+            )
+        # Performance testing against a local copy of the Telia API
+        stand_in = self.addon_utils.get_setting("standInServer").rstrip("/")
+        if stand_in:
+            self.web_utils.host_overrides = dict.fromkeys(API_HOSTS, stand_in)
+        self.response_cache = ResponseCache(self.addon_utils.profile)
+        # Called without arguments to renew the token after a 401 response
+        self.on_unauthorized = None
+        # Called with the operation name, variables and result of every
+        # cached query answered by Telia rather than the cache
+        self.on_fetched = None
+
+        # Everything but the token is fixed for the lifetime of the object
+        self.mutation_headers = {
+            "User-Agent": "kodi.tv",
+            "client-name": "web",
+            "tv-client-boot-id": self.tv_client_boot_id
         }
+        self.query_headers = dict(self.mutation_headers, **{"x-country": "SE"})
+
+    def _make_request(self, request, headers=None, payload=None):
+        response = self.web_utils.make_request(
+            request, headers=headers, payload=payload
+        )
+        if (response.status_code == 401 and headers and
+                "Authorization" in headers and self.on_unauthorized):
+            self.on_unauthorized()
+            headers = dict(
+                headers, Authorization="Bearer " + self.token_data["accessToken"]
+            )
+            response = self.web_utils.make_request(
+                request, headers=headers, payload=payload
+            )
+        return response
+
+    def _graphql_headers(self, operation):
+        headers = dict(
+            self.query_headers if operation.idempotent
+            else self.mutation_headers
+        )
+        headers["Authorization"] = "Bearer " + self.token_data["accessToken"]
+        return headers
+
+    def _graphql(self, name, variables=None, stale=False):
+        operation = OPERATIONS[name]
+        if variables is None:
+            variables = {}
+        (request, payload) = operation.request(variables)
+        headers = self._graphql_headers(operation)
+
+        if operation.cacheable:
+            response_json = self._cached_request(
+                operation, variables, request, headers, stale
+            )
+        else:
+            response_json = response_check(self._make_request(
+                request, headers=headers, payload=payload
+            ))
+            for invalidated in operation.invalidates:
+                self.response_cache.clear(invalidated)
+        return operation.extract(response_json)
+
+    def _graphql_batch(self, calls):
+        # Only queries can be batched; their order in the batch is the
+        # order of the results.
+        results = [None]*len(calls)
+        pending = []
+        for (index, (name, variables)) in enumerate(calls):
+            operation = OPERATIONS[name]
+            if not operation.idempotent:
+                raise ValueError(
+                    "Operation '{0}' can't be batched".format(name)
+                )
+            operation.check_variables(variables)
+            key = self.response_cache.key(self.device_id, name, variables)
+            if operation.cacheable:
+                entry = self.response_cache.get(name, key)
+                if entry and self.response_cache.is_fresh(entry, operation.ttl):
+                    results[index] = operation.extract(entry["data"])
+                    continue
+            pending.append((index, operation, variables, key))
+
+        if pending:
+            # Every answer that came through is cached before the first
+            # failure is raised, so a partial outage costs only the failures
+            errors = []
+            for ((index, operation, variables, key), response_json) in zip(
+                pending, self._send_batch(pending)
+            ):
+                if not isinstance(response_json, Exception):
+                    try:
+                        error_check(response_json)
+                    except TeliaException as error:
+                        response_json = error
+                if isinstance(response_json, Exception):
+                    errors.append(response_json)
+                    continue
+                if operation.cacheable:
+                    self.response_cache.set(operation.name, key, response_json)
+                results[index] = operation.extract(response_json)
+            if errors:
+                raise errors[0]
+        return results
+
+    def _send_batch(self, pending):
+        headers = self._graphql_headers(pending[0][1])
+        if len(pending) > 1 and not self._batching_rejected():
+            payload = [
+                operation.payload(variables)
+                for (_, operation, variables, _) in pending
+            ]
+            try:
+                response = self._make_request(
+                    {"POST": {"url": pending[0][1].url}}, headers=headers,
+                    payload=payload
+                )
+            except WebException:
+                # A network error says nothing about batching support
+                response = None
+            if response is not None:
+                try:
+                    response_json = response.json()
+                except ValueError:
+                    response_json = None
+                if (response.status_code == 200 and
+                        isinstance(response_json, list) and
+                        len(response_json) == len(pending)):
+                    return response_json
+                # Remember a rejection so later screens don't pay for it,
+                # but not a server error, which may be gone next time
+                if (400 <= response.status_code < 500 or
+                        (200 <= response.status_code < 300 and
+                         response_json is not None)):
+                    self.response_cache.set("batching", "rejected", True)
+
+        def send_single(call):
+            (_, operation, variables, _) = call
+            (request, _) = operation.request(variables)
+            try:
+                return response_check(
+                    self._make_request(request, headers=headers)
+                )
+            except (TeliaException, WebException, ValueError) as error:
+                # Raised by _graphql_batch once the other answers are cached
+                return error
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            return list(executor.map(send_single, pending))
+
+    def _batching_rejected(self):
+        entry = self.response_cache.get("batching", "rejected")
+        return entry is not None and self.response_cache.is_fresh(
+            entry, self.batching_retry_interval
+        )
+
+    def _cached_request(self, operation, variables, request, headers,
+                        stale=False):
+        key = self.response_cache.key(
+            self.device_id, operation.name, variables
+        )
+        entry = self.response_cache.get(operation.name, key)
+        if entry and self.response_cache.is_fresh(entry, operation.ttl):
+            return entry["data"]
+
+        if entry and stale:
+            # Serve the expired copy right away and let a worker thread
+            # update it for the next visit. A failing refresh leaves the
+            # stored copy in place, so a flaky backend never blocks browsing.
+            threading.Thread(
+                target=self._revalidate,
+                args=(operation, variables, request, headers, key, entry)
+            ).start()
+            return entry["data"]
+
+        return self._fetch(operation, variables, request, headers, key, entry)
+
+    def _revalidate(self, operation, variables, request, headers, key,
+                    entry):
+        try:
+            self._fetch(operation, variables, request, headers, key, entry)
+        except (TeliaException, WebException, ValueError) as error:
+            self.addon_utils.log(
+                "Background refresh failed: {0}".format(error)
+            )
+
+    def _fetch(self, operation, variables, request, headers, key,
+               entry=None):
+        if entry:
+            headers = dict(headers)
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["lastModified"]:
+                headers["If-Modified-Since"] = entry["lastModified"]
+
+        response = self._make_request(request, headers=headers)
+        if entry and response.status_code == 304:
+            self.response_cache.touch(operation.name, key, entry)
+            response_json = entry["data"]
+        else:
+            response_json = response_check(response)
+            self.response_cache.set(
+                operation.name, key, response_json,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+        if self.on_fetched is not None:
+            self.on_fetched(
+                operation.name, variables, operation.extract(response_json)
+            )
+        return response_json
 
     def login(self, username, password):
         request = {
             "POST": {
                 "scheme": "https",
-                "host": "ottapi.prod.telia.net",
+                "host": OTT_HOST,
                 "filename": "/web/se/logingateway/rest/v1/login"
             }
         }
@@ -75,7 +311,7 @@ class TeliaPlay():
             "whiteLabelBrand": "TELIA"
         }
 
-        response_json = self.web_utils.make_request(
+        response_json = self._make_request(
             request, headers=headers, payload=payload
         ).json()
         error_check(response_json)
@@ -86,7 +322,7 @@ class TeliaPlay():
         request = {
             "POST": {
                 "scheme": "https",
-                "host": "ottapi.prod.telia.net",
+                "host": OTT_HOST,
                 "filename": "/web/se/tvclientgateway/rest/secure/v1/provision"
             }
         }
@@ -103,7 +339,7 @@ class TeliaPlay():
             "uiName": "telia-web",
             "platformName": platform.system()
         }
-        response = self.web_utils.make_request(
+        response = self._make_request(
             request, headers=headers, payload=payload
         )
         if response.status_code != 200:
@@ -114,7 +350,7 @@ class TeliaPlay():
         request = {
             "DELETE": {
                 "scheme": "https",
-                "host": "ottapi.prod.telia.net",
+                "host": OTT_HOST,
                 "filename": "/web/se/logingateway/rest/secure/v1/logout"
             }
         }
@@ -122,7 +358,7 @@ class TeliaPlay():
             "User-Agent": "kodi.tv",
             "tv-client-boot-id": self.tv_client_boot_id
         }
-        self.web_utils.make_request(
+        self._make_request(
             request, headers=headers
         )
 
@@ -130,7 +366,7 @@ class TeliaPlay():
         request = {
             "POST": {
                 "scheme": "https",
-                "host": "ottapi.prod.telia.net",
+                "host": OTT_HOST,
                 "filename": "/web/se/logingateway/rest/v1/login/refresh"
             }
         }
@@ -144,348 +380,161 @@ class TeliaPlay():
             "refreshToken": self.token_data["refreshToken"]
         }
 
-        response_json = self.web_utils.make_request(
+        response_json = self._make_request(
             request, headers=headers, payload=payload
         ).json()
         error_check(response_json)
         self.token_data = response_json
         return response_json
 
-    def get_main_menu(self):
-        request = {
-            "GET": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql",
-                "query": {
-                    "operationName": "getMainMenu",
-                    "variables": {},
-                    "extensions": {
-                        "persistedQuery": {
-                            "version": 1,
-                            "sha256Hash": self.graphql_hashes["getMainMenu"]
-                        }
-                    }
-                }
-            }
-        }
-
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"],
-            "x-country": "SE"
-        }
-
-        response_json = self.web_utils.make_request(
-            request, headers=headers
-        ).json()
-        error_check(response_json)
-        return response_json["data"]["mainMenu"]["items"]
-
-    def search(self, query, limit, offset):
-        request = {
-            "GET": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql",
-                "query": {
-                    "operationName": "search",
-                    "variables": {
-                        "q": query,
-                        "limit": limit,
-                        "offset": offset,
-                        "searchRentalsType": "ALL",
-                        "searchSubscriptionType": "IN_SUBSCRIPTION"
-                    },
-                    "extensions": {
-                        "persistedQuery": {
-                            "version": 1,
-                            "sha256Hash": self.graphql_hashes["search"]
-                        }
-                    }
-                }
-            }
-        }
-        
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"],
-            "x-country": "SE"
-        }
-        
-        response_json = self.web_utils.make_request(
-            request, headers=headers
-        ).json()
-        error_check(response_json)
-        return response_json["data"]["search2"]
+    def get_main_menu(self, stale=False):
+        return self._graphql("getMainMenu", stale=stale)
+
+    def search(self, query, limit, offset, stale=False):
+        return self._graphql("search", {
+            "q": query,
+            "limit": limit,
+            "offset": offset,
+            "searchRentalsType": "ALL",
+            "searchSubscriptionType": "IN_SUBSCRIPTION"
+        }, stale=stale)
+
+    def search_all(self, query, limit, max_items):
+        return self._get_windows(
+            lambda offset: self.search(query, limit, offset),
+            limit, -(-max_items // limit),
+            self.response_cache.key(self.device_id, "search", query, limit)
+        )
 
-    def get_page(self, page_id):
-        request = {
-            "GET": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql",
-                "query": {
-                    "operationName": "getPage",
-                    "variables": {
-                        "id": page_id
-                    },
-                    "extensions": {
-                        "persistedQuery": {
-                            "version": 1,
-                            "sha256Hash": self.graphql_hashes["getPage"]
-                        }
-                    }
-                }
-            }
-        }
+    def get_page(self, page_id, stale=False):
+        return self._graphql("getPage", {"id": page_id}, stale=stale)
 
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"],
-            "x-country": "SE"
-        }
-
-        response_json = self.web_utils.make_request(
-            request, headers=headers
-        ).json()
-        error_check(response_json)
-        return response_json["data"]["page"]["pagePanels"]["items"]
+    def get_pages(self, page_ids):
+        return self._graphql_batch([
+            ("getPage", {"id": page_id}) for page_id in page_ids
+        ])
 
     def get_channels(self, timestamp, channel_limit=3, offset=0):
-        request = {
-            "GET": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql",
-                "query": {
-                    "operationName": "getTvChannels",
-                    "variables": {
-                        "timestamp": int(timestamp),
-                        "limit": channel_limit,
-                        "programLimit": 3,
-                        "offset": offset
-                    },
-                    "extensions": {
-                        "persistedQuery": {
-                            "version": 1,
-                            "sha256Hash": self.graphql_hashes["getTvChannels"]
-                        }
-                    }
-                }
-            }
-        }
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"],
-            "x-country": "SE"
-        }
-
-        response_json = self.web_utils.make_request(
-            request, headers=headers
-        ).json()
-        error_check(response_json)
-        return response_json["data"]["channels"]
+        return self._graphql("getTvChannels", {
+            "timestamp": int(timestamp),
+            "limit": channel_limit,
+            "programLimit": 3,
+            "offset": offset
+        })
+
+    def _get_windows(self, get_window, limit, max_windows=None,
+                     count_key=None):
+        # With the number of windows seen last time, all of them are fetched
+        # in one concurrent wave. Otherwise window 0 goes first and the next
+        # wave covers the total it reports, or else grows by doubling.
+        expected = 0
+        if count_key is not None:
+            entry = self.response_cache.get("windows", count_key)
+            if entry is not None:
+                expected = entry["data"]
+        windows = []
+        reported = None
+        wave_size = expected or 1
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            while True:
+                end = len(windows) + wave_size
+                for bound in (max_windows, reported):
+                    if bound is not None:
+                        end = min(end, bound)
+                offsets = range(len(windows)*limit, end*limit, limit)
+                last = not offsets
+                for window in executor.map(get_window, offsets):
+                    windows.append(window)
+                    if reported is None:
+                        reported = self._window_count(window, limit)
+                    if not ("pageInfo" in window and
+                            window["pageInfo"]["hasNextPage"]):
+                        last = True
+                        break
+                if last or len(windows) in (max_windows, reported):
+                    break
+                if reported is not None:
+                    wave_size = reported - len(windows)
+                else:
+                    # Guessing beyond what the pool runs at once gains
+                    # nothing but requests past the end
+                    wave_size = min(2*wave_size, self.max_workers)
+
+        if count_key is not None and len(windows) != expected:
+            self.response_cache.set("windows", count_key, len(windows))
+        return windows
+
+    @staticmethod
+    def _window_count(window, limit):
+        # Windows of a listing whose response reports its total
+        try:
+            return max(1, -(-window["pageInfo"]["totalCount"] // limit))
+        except (KeyError, TypeError):
+            return None
+
+    def get_all_channels(self, timestamp, channel_limit):
+        return self._get_windows(
+            lambda offset: self.get_channels(timestamp, channel_limit, offset),
+            channel_limit, count_key=self.response_cache.key(
+                self.device_id, "getTvChannels", channel_limit
+            )
+        )
 
     def get_channel(self, channel_id, timestamp):
-        request = {
-            "GET": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql",
-                "query": {
-                    "operationName": "getTvChannel",
-                    "variables": {
-                        "timestamp": timestamp,
-                        "offset": 0,
-                        "id": channel_id
-                    },
-                    "extensions": {
-                        "persistedQuery": {
-                            "version": 1,
-                            "sha256Hash": self.graphql_hashes["getTvChannel"]
-                        }
-                    }
-                }
-            }
-        }
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"],
-            "x-country": "SE"
-        }
-
-        response_json = self.web_utils.make_request(
-            request, headers=headers
-        ).json()
-        error_check(response_json)
-        return response_json["data"]["channel"]
+        return self._graphql("getTvChannel", {
+            "timestamp": timestamp,
+            "offset": 0,
+            "id": channel_id
+        })
 
     def get_store(self, store_id):
-        request = {
-            "GET": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql",
-                "query": {
-                    "operationName": "getStorePage",
-                    "variables": {
-                        "id": store_id,
-                        "pagePanelsOffset": 0
-                    },
-                    "extensions": {
-                        "persistedQuery": {
-                            "version": 1,
-                            "sha256Hash": self.graphql_hashes["getStorePage"]
-                        }
-                    }
-                }
-            }
-        }
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"],
-            "x-country": "SE"
-        }
-
-        response_json = self.web_utils.make_request(
-            request, headers=headers
-        ).json()
-        error_check(response_json)
-        return response_json["data"]["store"]
-
-    def get_panel(self, panel_id, limit, offset):
-        request = {
-            "GET": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql",
-                "query": {
-                    "operationName": "getPanel",
-                    "variables": {
-                        "id": panel_id,
-                        "config": {
-                            "limit": limit,
-                            "offset": offset,
-                            "sort": {
-                                "key": "TITLE",
-                                "order": "ASC"
-                            }
-                        }
-                    },
-                    "extensions": {
-                        "persistedQuery": {
-                            "version": 1,
-                            "sha256Hash": self.graphql_hashes["getPanel"]
-                        }
-                    }
+        return self._graphql("getStorePage", {
+            "id": store_id,
+            "pagePanelsOffset": 0
+        })
+
+    def get_panel(self, panel_id, limit, offset, stale=False):
+        return self._graphql("getPanel", {
+            "id": panel_id,
+            "config": {
+                "limit": limit,
+                "offset": offset,
+                "sort": {
+                    "key": "TITLE",
+                    "order": "ASC"
                 }
             }
-        }
+        }, stale=stale)
 
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"],
-            "x-country": "SE"
-        }
-
-        response_json = self.web_utils.make_request(
-            request, headers=headers
-        ).json()
-        error_check(response_json)
-        return response_json["data"]["panel"]["selectionMediaContent"]
+    def get_all_panel(self, panel_id, limit, max_items):
+        return self._get_windows(
+            lambda offset: self.get_panel(panel_id, limit, offset),
+            limit, -(-max_items // limit),
+            self.response_cache.key(self.device_id, "getPanel", panel_id, limit)
+        )
 
     def get_series(self, series_id):
-        request = {
-            "GET": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql",
-                "query": {
-                    "operationName": "getSeries",
-                    "variables": {
-                        "id": series_id
-                    },
-                    "extensions": {
-                        "persistedQuery": {
-                            "version": 1,
-                            "sha256Hash": self.graphql_hashes["getSeries"]
-                        }
-                    }
-                }
-            }
-        }
+        return self._graphql("getSeries", {"id": series_id})
 
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"],
-            "x-country": "SE"
-        }
-        response_json = self.web_utils.make_request(
-            request, headers=headers
-        ).json()
-        error_check(response_json)
-        return response_json["data"]["series"]
-
-    def get_season(self, season_id):
-        request = {
-            "GET": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql",
-                "query": {
-                    "operationName": "getSeason",
-                    "variables": {
-                        "seasonId": season_id,
-                        "sort": {
-                            "order": "DESC"
-                        }
-                    },
-                    "extensions": {
-                        "persistedQuery": {
-                            "version": 1,
-                            "sha256Hash": self.graphql_hashes["getSeason"]
-                        }
-                    }
-                }
+    def get_season(self, season_id, order="DESC"):
+        return self._graphql("getSeason", {
+            "seasonId": season_id,
+            "sort": {
+                "order": order
             }
-        }
-
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"],
-            "x-country": "SE"
-        }
+        })
 
-        response_json = self.web_utils.make_request(
-            request, headers=headers
-        ).json()
-        error_check(response_json)
-        return response_json["data"]["season"]["episodes"]["episodeItems"]
+    def get_seasons(self, season_ids, order="DESC"):
+        return self._graphql_batch([
+            ("getSeason", {"seasonId": season_id, "sort": {"order": order}})
+            for season_id in season_ids
+        ])
 
     def validate_stream(self):
         request = {
             "POST": {
                 "scheme": "https",
-                "host": "tvclientgateway-telia.clientapi-prod.live.tv.telia.net",
+                "host": TV_CLIENT_HOST,
                 "filename": "/tvclientgateway/rest/secure/v1/provision"
             }
         }
@@ -502,7 +551,7 @@ class TeliaPlay():
             "category": "desktop_" + platform.system()
         }
 
-        response = self.web_utils.make_request(
+        response = self._make_request(
             request, headers=headers, payload=payload
         )
         if response.status_code != 200:
@@ -512,7 +561,7 @@ class TeliaPlay():
         request = {
             "GET": {
                 "scheme": "https",
-                "host": "ottapi.prod.telia.net",
+                "host": OTT_HOST,
                 "filename": "/web/se/exploregateway/rest/v4/explore/media/{0}".format(video_id),
                 "query": {
                     "deviceType": "WEB",
@@ -523,7 +572,7 @@ class TeliaPlay():
         headers = {
             "User-Agent": "kodi.tv",
         }
-        response_json = self.web_utils.make_request(
+        response_json = self._make_request(
             request, headers=headers
         ).json()
         error_check(response_json)
@@ -537,7 +586,7 @@ class TeliaPlay():
         request = {
             "POST": {
                 "scheme": "https",
-                "host": "atvse.telia.net",
+                "host": RENTAL_HOST,
                 "filename": "/rest/v1/secure_v2/mediarentals/videos/{0}".format(vod_id)
             }
         }
@@ -550,83 +599,31 @@ class TeliaPlay():
             "deviceType": "WEB",
             "purchasePinCode": pin_code
         }
-        response_json = self.web_utils.make_request(
+        response_json = self._make_request(
             request, headers=headers, payload=payload
         ).json()
         error_check(response_json)
+        # Personal panels like 'Min lista' and rentals are part of getPage.
+        self.response_cache.clear("getPage")
         return response_json
 
     def add_to_my_list(self, media_id):
-        request = {
-            "POST": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql"
-            }
-        }
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"]
-        }
-        payload = {
-            "operationName": "addToMyList",
-            "variables": {
-                "id": media_id,
-                "type": "SERIES" if media_id.startswith("s") else "MEDIA"
-            },
-            "extensions": {
-                "persistedQuery": {
-                    "version": 1,
-                    "sha256Hash": self.graphql_hashes["addToMyList"]
-                }
-            }
-        }
-        response_json = self.web_utils.make_request(
-            request, headers=headers, payload=payload
-        ).json()
-        error_check(response_json)
-        return response_json
+        return self._graphql("addToMyList", {
+            "id": media_id,
+            "type": "SERIES" if media_id.startswith("s") else "MEDIA"
+        })
 
     def remove_from_my_list(self, media_id):
-        request = {
-            "POST": {
-                "scheme": "https",
-                "host": "graphql-telia.t6a.net",
-                "filename": "/graphql"
-            }
-        }
-        headers = {
-            "User-Agent": "kodi.tv",
-            "client-name": "web",
-            "tv-client-boot-id": self.tv_client_boot_id,
-            "Authorization": "Bearer " + self.token_data["accessToken"]
-        }
-        payload = {
-            "operationName": "removeFromMyList",
-            "variables": {
-                "id": media_id,
-                "type": "SERIES" if media_id.startswith("s") else "MEDIA"
-            },
-            "extensions": {
-                "persistedQuery": {
-                    "version": 1,
-                    "sha256Hash": self.graphql_hashes["removeFromMyList"]
-                }
-            }
-        }
-        response_json = self.web_utils.make_request(
-            request, headers=headers, payload=payload
-        ).json()
-        error_check(response_json)
-        return response_json
+        return self._graphql("removeFromMyList", {
+            "id": media_id,
+            "type": "SERIES" if media_id.startswith("s") else "MEDIA"
+        })
 
     def get_stream(self, stream_id, stream_type):
         request = {
             "POST": {
                 "scheme": "https",
-                "host": "streaminggateway-telia.clientapi-prod.live.tv.telia.net",
+                "host": STREAMING_HOST,
                 "filename": "/streaminggateway/rest/secure/v2/streamingticket/"
                 "{0}/{1}".format(
                     "CHANNEL" if stream_type == "live" else "MEDIA", stream_id),
@@ -662,7 +659,7 @@ class TeliaPlay():
             }
         }
 
-        response_json = self.web_utils.make_request(
+        response_json = self._make_request(
             request, headers=headers, payload=payload
         ).json()
         error_check(response_json)
@@ -676,7 +673,7 @@ class TeliaPlay():
         request = {
             "DELETE": {
                 "scheme": "https",
-                "host": "streaminggateway-telia.clientapi-prod.live.tv.telia.net",
+                "host": STREAMING_HOST,
                 "filename": "/streaminggateway/rest/secure/v2/streamingticket/CHANNEL/18",
                 "query": {
                     "sessionId": self.session_id,
@@ -692,7 +689,7 @@ class TeliaPlay():
             "Authorization": "Bearer " + self.token_data["accessToken"],
         }
         payload = {}
-        response = self.web_utils.make_request(
+        response = self._make_request(
             request, headers=headers, payload=payload
         )
         return response
@@ -0,0 +1,80 @@
+import os
+import time
+import hashlib
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from resources.lib.webutils import WebUtils, WebException
+
+
+class ArtworkStore():
+    dirname = "artwork"
+    # Concurrent downloads when pre-warming
+    max_workers = 4
+
+    def __init__(self, profile):
+        self.artwork_path = os.path.join(profile, self.dirname)
+        os.makedirs(self.artwork_path, exist_ok=True)
+
+    def _filepath(self, url):
+        extension = os.path.splitext(urllib.parse.urlsplit(url).path)[1]
+        return os.path.join(
+            self.artwork_path,
+            hashlib.sha1(url.encode("utf-8")).hexdigest() + (extension or ".jpg")
+        )
+
+    def get(self, url):
+        # Local copy of the image if it has been pre-warmed, else the URL
+        if not url:
+            return url
+        filepath = self._filepath(url)
+        return filepath if os.path.exists(filepath) else url
+
+    def prewarm(self, urls, max_count, max_bytes):
+        urls = [
+            url for url in dict.fromkeys(urls)
+            if url and not os.path.exists(self._filepath(url))
+        ][:max_count]
+        if not urls:
+            return
+
+        web_utils = WebUtils()
+        lock = threading.Lock()
+        budget = {"bytes": max_bytes}
+
+        def download(url):
+            with lock:
+                if budget["bytes"] <= 0:
+                    return
+            try:
+                response = web_utils.make_request({"GET": {"url": url}})
+            except WebException:
+                return
+            if response.status_code != 200:
+                return
+            with lock:
+                if len(response.content) > budget["bytes"]:
+                    budget["bytes"] = 0
+                    return
+                budget["bytes"] -= len(response.content)
+
+            filepath = self._filepath(url)
+            tmp_filepath = "{0}.{1}-{2}.tmp".format(
+                filepath, os.getpid(), threading.get_ident()
+            )
+            with open(tmp_filepath, "wb") as image_file:
+                image_file.write(response.content)
+            os.replace(tmp_filepath, filepath)
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            list(executor.map(download, urls))
+
+    def prune(self, max_age):
+        oldest = time.time() - max_age
+        for filename in os.listdir(self.artwork_path):
+            filepath = os.path.join(self.artwork_path, filename)
+            try:
+                if os.path.getmtime(filepath) < oldest:
+                    os.remove(filepath)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,105 @@
+import os
+import time
+from resources.lib.timeutils import parse_iso_datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock():
+
+    def __init__(self, path, blocking=True):
+        self.path = path
+        self.blocking = blocking
+        self.lock_file = None
+
+    def __enter__(self):
+        self.lock_file = open(self.path, "a")
+        try:
+            if fcntl is not None:
+                fcntl.flock(
+                    self.lock_file.fileno(),
+                    fcntl.LOCK_EX if self.blocking
+                    else fcntl.LOCK_EX | fcntl.LOCK_NB
+                )
+            else:
+                msvcrt.locking(
+                    self.lock_file.fileno(),
+                    msvcrt.LK_LOCK if self.blocking else msvcrt.LK_NBLCK, 1
+                )
+        except OSError:
+            self.lock_file.close()
+            self.lock_file = None
+            if self.blocking:
+                raise
+            return False
+        return True
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.lock_file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.lock_file.seek(0)
+            msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.lock_file.close()
+        self.lock_file = None
+
+
+class TokenManager():
+    lock_filename = "token.lock"
+    # Seconds before expiry at which the token is renewed
+    refresh_margin = 1800
+
+    def __init__(self, userdata_handler, username):
+        self.userdata_handler = userdata_handler
+        self.username = username
+        self.lock_path = os.path.join(
+            userdata_handler.addon_utils.profile, self.lock_filename
+        )
+
+    @staticmethod
+    def set_token(userdata, token_data):
+        userdata["tokenData"] = token_data
+        # Parsing validTo is slow, so it is done once and kept as an epoch
+        userdata["tokenExpiry"] = parse_iso_datetime(
+            token_data["validTo"]
+        ).timestamp()
+
+    def expiry(self, userdata):
+        if "tokenExpiry" not in userdata:
+            # Userdata stored before expiry was kept as an epoch
+            self.set_token(userdata, userdata["tokenData"])
+            self.userdata_handler.add(self.username, userdata)
+        return userdata["tokenExpiry"]
+
+    def is_expired(self, userdata):
+        return time.time() >= self.expiry(userdata)
+
+    def needs_refresh(self, userdata):
+        return time.time() >= self.expiry(userdata) - self.refresh_margin
+
+    def refresh(self, telia_play, blocking=True):
+        used_token = telia_play.token_data["accessToken"]
+        with FileLock(self.lock_path, blocking) as locked:
+            if not locked:
+                # Another process is already refreshing
+                return False
+
+            userdata = self.userdata_handler.get(self.username)
+            # Skip the refresh if another process did it while we waited
+            if userdata["tokenData"]["accessToken"] == used_token:
+                self.set_token(userdata, telia_play.refresh_token())
+                self.userdata_handler.add(self.username, userdata)
+            telia_play.token_data = userdata["tokenData"]
+        return True
+
+    def refresh_if_due(self, telia_play):
+        userdata = self.userdata_handler.get(self.username)
+        if self.needs_refresh(userdata):
+            self.refresh(telia_play)
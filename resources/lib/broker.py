@@ -0,0 +1,111 @@
+import os
+import json
+import base64
+import socket
+import socketserver
+import requests
+
+
+class BrokerException(Exception):
+    pass
+
+
+class BrokerHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        try:
+            response = self.server.session.request(
+                request["method"], request["url"],
+                headers=request["headers"], json=request["payload"]
+            )
+            reply = {
+                "status": response.status_code,
+                "headers": dict(response.headers),
+                "content": base64.b64encode(response.content).decode("ascii")
+            }
+        except requests.exceptions.RequestException as re:
+            reply = {"error": str(re)}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+def is_supported():
+    return hasattr(socket, "AF_UNIX")
+
+
+def socket_path(profile):
+    return os.path.join(profile, "broker.sock")
+
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    # Same as socketserver.UnixStreamServer, which is missing on platforms
+    # without Unix sockets
+    address_family = getattr(socket, "AF_UNIX", None)
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        # A socket left behind by a crashed service would block the bind
+        try:
+            os.remove(socket_path)
+        except FileNotFoundError:
+            pass
+        super().__init__(socket_path, BrokerHandler)
+        self.socket_path = socket_path
+        self.session = requests.session()
+
+    def server_close(self):
+        super().server_close()
+        self.session.close()
+        try:
+            os.remove(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+class BrokerClient():
+    timeout = 30
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+
+    def is_running(self):
+        return os.path.exists(self.socket_path)
+
+    def request(self, method, url, headers=None, payload=None):
+        message = json.dumps({
+            "method": method,
+            "url": url,
+            "headers": headers,
+            "payload": payload
+        }).encode("utf-8") + b"\n"
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as error:
+            sock.close()
+            # Nothing has been sent, so the caller may safely go direct
+            raise BrokerException(str(error))
+
+        try:
+            with sock, sock.makefile("rb") as sock_file:
+                sock.sendall(message)
+                reply = json.loads(sock_file.readline())
+        except (OSError, ValueError) as error:
+            raise requests.exceptions.ConnectionError(str(error))
+
+        if "error" in reply:
+            raise requests.exceptions.RequestException(reply["error"])
+
+        response = requests.models.Response()
+        response.status_code = reply["status"]
+        response.headers = requests.structures.CaseInsensitiveDict(
+            reply["headers"]
+        )
+        response._content = base64.b64decode(reply["content"])
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers
+        )
+        response.url = url
+        return response
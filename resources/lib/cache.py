@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+class ResponseCache():
+    dirname = "cache"
+
+    def __init__(self, profile):
+        self.cache_path = os.path.join(profile, self.dirname)
+        os.makedirs(self.cache_path, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        key_str = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(key_str.encode("utf-8")).hexdigest()
+
+    def _filepath(self, operation, key):
+        return os.path.join(
+            self.cache_path, "{0}-{1}.json".format(operation, key)
+        )
+
+    def get(self, operation, key):
+        try:
+            with open(self._filepath(operation, key), "r") as cache_file:
+                return json.load(cache_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set(self, operation, key, data, etag=None, last_modified=None):
+        entry = {
+            "timestamp": time.time(),
+            "etag": etag,
+            "lastModified": last_modified,
+            "data": data
+        }
+        filepath = self._filepath(operation, key)
+        tmp_filepath = "{0}.{1}-{2}.tmp".format(
+            filepath, os.getpid(), threading.get_ident()
+        )
+        with open(tmp_filepath, "w") as cache_file:
+            json.dump(entry, cache_file)
+        os.replace(tmp_filepath, filepath)
+        return entry
+
+    def touch(self, operation, key, entry):
+        return self.set(
+            operation, key, entry["data"], entry["etag"],
+            entry["lastModified"]
+        )
+
+    @staticmethod
+    def is_fresh(entry, ttl):
+        return time.time() - entry["timestamp"] < ttl
+
+    def clear(self, operation=None):
+        prefix = "" if operation is None else operation + "-"
+        for filename in os.listdir(self.cache_path):
+            if filename.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.cache_path, filename))
+                except FileNotFoundError:
+                    pass
+
+    def prune(self, max_age, operation=None):
+        oldest = time.time() - max_age
+        prefix = "" if operation is None else operation + "-"
+        for filename in os.listdir(self.cache_path):
+            if not filename.startswith(prefix):
+                continue
+            filepath = os.path.join(self.cache_path, filename)
+            try:
+                if os.path.getmtime(filepath) < oldest:
+                    os.remove(filepath)
+            except FileNotFoundError:
+                pass
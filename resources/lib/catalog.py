@@ -0,0 +1,145 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import unicodedata
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text):
+    # Case and diacritic insensitive, so 'Ö' and 'o' find the same titles
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return "".join(
+        char for char in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(char)
+    )
+
+
+def tokenize(text):
+    return _WORD.findall(normalize(text)) if text else []
+
+
+class CatalogIndex():
+    filename = "catalog.db"
+    # Weight of a match in each field; the highest weight of a term counts
+    title_weight = 4
+    genre_weight = 2
+    description_weight = 1
+
+    def __init__(self, profile):
+        os.makedirs(profile, exist_ok=True)
+        self.connection = sqlite3.connect(
+            os.path.join(profile, self.filename), timeout=10
+        )
+        self.create_tables()
+
+    def create_tables(self):
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS media (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    seen REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS terms (
+                    term TEXT NOT NULL,
+                    media_id TEXT NOT NULL,
+                    weight INTEGER NOT NULL,
+                    PRIMARY KEY (term, media_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS terms_media_id
+                    ON terms (media_id);
+            """)
+
+    def close(self):
+        self.connection.close()
+
+    def _terms(self, media):
+        weights = {}
+        for (text, weight) in (
+            (media.get("description"), self.description_weight),
+            (media.get("descriptionLong"), self.description_weight),
+            (media.get("genre"), self.genre_weight),
+            (media.get("title"), self.title_weight)
+        ):
+            for term in tokenize(text):
+                weights[term] = weight
+        weights[media["id"].casefold()] = self.title_weight
+        return weights
+
+    def add(self, medias):
+        now = time.time()
+        media_rows = []
+        term_rows = []
+        for media in medias:
+            media_rows.append((
+                media["id"], media.get("title") or "", json.dumps(media), now
+            ))
+            term_rows.extend(
+                (term, media["id"], weight)
+                for (term, weight) in self._terms(media).items()
+            )
+
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM terms WHERE media_id = ?",
+                [(media_row[0],) for media_row in media_rows]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?)", media_rows
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO terms VALUES (?, ?, ?)", term_rows
+            )
+
+    def search(self, query, limit):
+        # Every word of the query has to match the start of a term
+        scores = None
+        for token in set(tokenize(query)):
+            rows = self.connection.execute(
+                "SELECT media_id, MAX(weight) FROM terms "
+                "WHERE term >= ? AND term < ? GROUP BY media_id",
+                (token, token + "\uffff")
+            ).fetchall()
+            if scores is None:
+                scores = dict(rows)
+            else:
+                matches = dict(rows)
+                scores = {
+                    media_id: score + matches[media_id]
+                    for (media_id, score) in scores.items()
+                    if media_id in matches
+                }
+            if not scores:
+                return []
+        if scores is None:
+            return []
+
+        media_ids = list(scores)
+        rows = []
+        # Stay below SQLite's limit on the number of parameters
+        for start in range(0, len(media_ids), 500):
+            chunk = media_ids[start:start + 500]
+            rows.extend(self.connection.execute(
+                "SELECT id, title, data FROM media WHERE id IN ({0})".format(
+                    ", ".join("?"*len(chunk))
+                ), chunk
+            ).fetchall())
+        rows.sort(key=lambda row: (-scores[row[0]], normalize(row[1])))
+        return [json.loads(data) for (_, _, data) in rows[:limit]]
+
+    def prune(self, max_age):
+        oldest = time.time() - max_age
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM terms WHERE media_id IN "
+                "(SELECT id FROM media WHERE seen < ?)", (oldest,)
+            )
+            self.connection.execute(
+                "DELETE FROM media WHERE seen < ?", (oldest,)
+            )
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import itertools
+import threading
+from resources.lib.auth import FileLock
+
+# Route and invocation the requests of this process are counted towards
+_context = {"route": None, "invocation": None}
+
+
+def start_invocation(route):
+    _context["route"] = route
+    _context["invocation"] = "{0}-{1}".format(os.getpid(), time.time())
+
+
+class RequestLog():
+    filename = "requests.log"
+    # Records kept when the log is trimmed
+    max_records = 2000
+    # Size at which the log is trimmed
+    max_bytes = 1000000
+
+    def __init__(self, profile):
+        os.makedirs(profile, exist_ok=True)
+        self.filepath = os.path.join(profile, self.filename)
+        self.lock_path = self.filepath + ".lock"
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        record = dict(record, time=time.time(), **_context)
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            # Small appends are atomic, so processes can share the file
+            with open(self.filepath, "a") as log_file:
+                log_file.write(line)
+                size = log_file.tell()
+            if size > self.max_bytes:
+                self._trim()
+
+    def _trim(self):
+        with FileLock(self.lock_path, blocking=False) as locked:
+            if not locked:
+                # Another process is trimming
+                return
+            lines = self._lines()[-self.max_records:]
+            tmp_filepath = "{0}.{1}.tmp".format(self.filepath, os.getpid())
+            with open(tmp_filepath, "w") as log_file:
+                log_file.writelines(lines)
+            os.replace(tmp_filepath, self.filepath)
+
+    def _lines(self):
+        try:
+            with open(self.filepath, "r") as log_file:
+                return log_file.readlines()
+        except FileNotFoundError:
+            return []
+
+    def records(self):
+        records = []
+        for line in self._lines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Cut short by a crash or a concurrent trim
+                pass
+        return records
+
+
+class RequestRecorder():
+    dirname = "fixtures"
+    # Credentials are never written to the fixtures
+    secret_headers = ("authorization", "cookie", "set-cookie")
+    secret_fields = (
+        "password", "accessToken", "refreshToken", "purchasePinCode"
+    )
+    redacted = "<redacted>"
+    # Shared by all recorders of the process, so file names never clash
+    counter = itertools.count(1)
+
+    def __init__(self, profile):
+        self.fixtures_path = os.path.join(profile, self.dirname)
+        os.makedirs(self.fixtures_path, exist_ok=True)
+
+    def _headers(self, headers):
+        return {
+            key: self.redacted if key.lower() in self.secret_headers
+            else value for (key, value) in (headers or {}).items()
+        }
+
+    def _redact(self, data):
+        if isinstance(data, dict):
+            return {
+                key: self.redacted if key in self.secret_fields
+                else self._redact(value) for (key, value) in data.items()
+            }
+        if isinstance(data, list):
+            return [self._redact(value) for value in data]
+        return data
+
+    def record(self, operation, method, url, headers, payload, response):
+        if response.status_code == 304:
+            # The body is only in the response cache, and an empty answer
+            # would spoil the recording of the full one
+            return
+        fixture = {
+            "request": {
+                "method": method,
+                "url": url,
+                "headers": self._headers(headers),
+                "payload": self._redact(payload)
+            },
+            "response": {
+                "status": response.status_code,
+                "headers": self._headers(response.headers)
+            }
+        }
+        try:
+            fixture["response"]["body"] = self._redact(response.json())
+        except ValueError:
+            fixture["response"]["text"] = response.text
+
+        # Sorted by name, the files are in the order they were recorded
+        filepath = os.path.join(
+            self.fixtures_path, "{0}-{1}-{2:05d}-{3}.json".format(
+                time.strftime("%Y%m%d-%H%M%S"), os.getpid(),
+                next(self.counter), operation
+            )
+        )
+        tmp_filepath = filepath + ".tmp"
+        with open(tmp_filepath, "w") as fixture_file:
+            json.dump(fixture, fixture_file)
+        os.replace(tmp_filepath, filepath)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction*len(values)))]
+
+
+def summarize(records, slowest=10):
+    lines = ["[B]Per operation[/B] (calls, p50, p95, mean size)"]
+    by_operation = {}
+    for record in records:
+        by_operation.setdefault(record["operation"], []).append(record)
+    for (operation, operation_records) in sorted(by_operation.items()):
+        totals = [record["total"] for record in operation_records]
+        sizes = [record["bytes"] for record in operation_records]
+        lines.append("{0}: {1}, {2:.0f} ms, {3:.0f} ms, {4:.0f} kB".format(
+            operation, len(totals), percentile(totals, 0.5),
+            percentile(totals, 0.95), sum(sizes) / len(sizes) / 1000
+        ))
+
+    lines.append("")
+    lines.append(
+        "[B]Slowest calls[/B] (total = connect + first byte + download "
+        "+ decode)"
+    )
+    for record in sorted(
+        records, key=lambda record: record["total"], reverse=True
+    )[:slowest]:
+        lines.append(
+            "{0} {1} ({2}): {3:.0f} = {4:.0f} + {5:.0f} + {6:.0f} + "
+            "{7:.0f} ms, {8} B, {9}".format(
+                time.strftime("%d %b %H:%M", time.localtime(record["time"])),
+                record["operation"], record["status"], record["total"],
+                record["connect"], record["ttfb"], record["download"],
+                record["decode"], record["bytes"], record["route"]
+            )
+        )
+
+    lines.append("")
+    lines.append("[B]Network calls per route[/B] (invocations, calls each)")
+    by_route = {}
+    for record in records:
+        by_route.setdefault(record["route"], []).append(record["invocation"])
+    for (route, invocations) in sorted(
+        by_route.items(), key=lambda item: str(item[0])
+    ):
+        lines.append("{0}: {1}, {2:.1f}".format(
+            route, len(set(invocations)),
+            len(invocations) / len(set(invocations))
+        ))
+    return "\n".join(lines)
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import sqlite3
+
+
+class EpgStore():
+    filename = "epg.db"
+    # Seconds before the channel line-up is fetched again
+    channels_max_age = 86400
+    # Seconds before the schedule of today or a future day is fetched again
+    schedule_max_age = 3600
+    # Days of past schedules kept for catch-up
+    catchup_days = 7
+
+    def __init__(self, profile):
+        os.makedirs(profile, exist_ok=True)
+        self.connection = sqlite3.connect(
+            os.path.join(profile, self.filename), timeout=10
+        )
+        self.create_tables()
+
+    def create_tables(self):
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS channels (
+                    id TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS channels_position
+                    ON channels (position);
+                CREATE TABLE IF NOT EXISTS channel_windows (
+                    offset INTEGER NOT NULL,
+                    channel_limit INTEGER NOT NULL,
+                    has_next INTEGER NOT NULL,
+                    synced REAL NOT NULL,
+                    PRIMARY KEY (offset, channel_limit)
+                );
+                CREATE TABLE IF NOT EXISTS programs (
+                    channel_id TEXT NOT NULL,
+                    start INTEGER NOT NULL,
+                    end INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (channel_id, start)
+                );
+                CREATE TABLE IF NOT EXISTS days (
+                    channel_id TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    synced REAL NOT NULL,
+                    PRIMARY KEY (channel_id, day)
+                );
+            """)
+
+    def close(self):
+        self.connection.close()
+
+    def get_channel_window(self, channel_limit, offset, timestamp):
+        row = self.connection.execute(
+            "SELECT has_next, synced FROM channel_windows "
+            "WHERE offset = ? AND channel_limit = ?",
+            (offset, channel_limit)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.channels_max_age:
+            return None
+
+        # Bounded on both sides, as positions may have gaps or duplicates
+        # after the line-up changed
+        rows = self.connection.execute(
+            "SELECT data FROM channels WHERE position >= ? "
+            "AND position < ? ORDER BY position LIMIT ?",
+            (offset, offset + channel_limit, channel_limit)
+        ).fetchall()
+
+        channel_items = []
+        for (data,) in rows:
+            channel = json.loads(data)
+            program = self.get_current_program(channel["id"], timestamp)
+            if program is None:
+                # The programs known for this channel have all ended
+                return None
+            channel["programs"] = {"programItems": [program]}
+            channel_items.append(channel)
+
+        return {
+            "channelItems": channel_items,
+            "pageInfo": {"hasNextPage": bool(row[0])}
+        }
+
+    def set_channel_window(self, channel_limit, offset, channels):
+        channel_rows = []
+        program_rows = []
+        for (position, channel) in enumerate(channels["channelItems"], offset):
+            channel = dict(channel)
+            programs = channel.pop("programs", None)
+            channel_rows.append(
+                (channel["id"], position, json.dumps(channel))
+            )
+            if programs:
+                program_rows.extend(
+                    self._program_row(channel["id"], program)
+                    for program in programs["programItems"]
+                )
+
+        try:
+            has_next = channels["pageInfo"]["hasNextPage"]
+        except KeyError:
+            has_next = False
+        # Nothing follows the last window of the line-up
+        end = offset + channel_limit if has_next else None
+
+        with self.connection:
+            # Channels that moved here from another window leave a gap
+            # there, so that window is fetched again
+            moved = self.connection.execute(
+                "SELECT position FROM channels WHERE id IN ({0}) "
+                "AND (position < ? OR position >= ?)".format(
+                    ", ".join("?"*len(channel_rows))
+                ), [row[0] for row in channel_rows] +
+                [offset, offset + channel_limit]
+            ).fetchall() if channel_rows else []
+            self.connection.executemany(
+                "DELETE FROM channel_windows WHERE offset <= ? "
+                "AND offset + channel_limit > ?",
+                [(position, position) for (position,) in moved]
+            )
+            # Channels no longer in this window, or past the end of the
+            # line-up, were removed or moved
+            if end is None:
+                self.connection.execute(
+                    "DELETE FROM channels WHERE position >= ?", (offset,)
+                )
+                self.connection.execute(
+                    "DELETE FROM channel_windows WHERE offset > ?",
+                    (offset,)
+                )
+            else:
+                self.connection.execute(
+                    "DELETE FROM channels WHERE position >= ? "
+                    "AND position < ?", (offset, end)
+                )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO channels VALUES (?, ?, ?)",
+                channel_rows
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO programs VALUES (?, ?, ?, ?)",
+                program_rows
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO channel_windows VALUES (?, ?, ?, ?)",
+                (offset, channel_limit, int(has_next), time.time())
+            )
+
+    def get_current_program(self, channel_id, timestamp):
+        row = self.connection.execute(
+            "SELECT data FROM programs WHERE channel_id = ? "
+            "AND start <= ? AND end > ? ORDER BY start DESC LIMIT 1",
+            (channel_id, timestamp, timestamp)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def is_day_synced(self, channel_id, day_start, day_end):
+        row = self.connection.execute(
+            "SELECT synced FROM days WHERE channel_id = ? AND day = ?",
+            (channel_id, day_start)
+        ).fetchone()
+        if row is None:
+            return False
+        # Schedules of days that have passed no longer change
+        if row[0]*1000 >= day_end:
+            return True
+        return time.time() - row[0] <= self.schedule_max_age
+
+    def get_programs(self, channel_id, day_start, day_end):
+        rows = self.connection.execute(
+            "SELECT data FROM programs WHERE channel_id = ? "
+            "AND start < ? AND end > ? ORDER BY start",
+            (channel_id, day_end, day_start)
+        ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def set_programs(self, channel_id, day_start, day_end, programs):
+        with self.connection:
+            # Programs that moved during a resync would otherwise keep
+            # their old slot next to the new one
+            self.connection.execute(
+                "DELETE FROM programs WHERE channel_id = ? "
+                "AND start >= ? AND start < ?",
+                (channel_id, day_start, day_end)
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO programs VALUES (?, ?, ?, ?)",
+                [self._program_row(channel_id, program)
+                 for program in programs]
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO days VALUES (?, ?, ?)",
+                (channel_id, day_start, time.time())
+            )
+
+    def prune(self, oldest_timestamp):
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM programs WHERE end < ?", (oldest_timestamp,)
+            )
+            self.connection.execute(
+                "DELETE FROM days WHERE day < ?", (oldest_timestamp,)
+            )
+
+    @staticmethod
+    def _program_row(channel_id, program):
+        return (
+            channel_id,
+            program["startTime"]["timestamp"],
+            program["endTime"]["timestamp"],
+            json.dumps(program)
+        )
@@ -1,10 +1,11 @@
 import os
 import sys
-import json
 import urllib.parse
 import xbmc
 import xbmcaddon
 import xbmcvfs
+from resources.lib.cache import ResponseCache
+from resources.lib.storage import UserStore
 
 
 class AddonUtils():
@@ -14,7 +15,8 @@ class AddonUtils():
         self.id = self.addon.getAddonInfo("id")
         self.name = self.addon.getAddonInfo("name")
         self.url = sys.argv[0]
-        self.handle = int(sys.argv[1])
+        # Services are started without a plugin handle.
+        self.handle = int(sys.argv[1]) if len(sys.argv) > 1 else -1
 
         self.path = xbmcvfs.translatePath(self.addon.getAddonInfo("path"))
         self.profile = xbmcvfs.translatePath(self.addon.getAddonInfo("profile"))
@@ -22,6 +24,18 @@ class AddonUtils():
         self.lib = os.path.join(self.resources, "lib")
         self.media = os.path.join(self.resources, "media")
         self.icon = self.addon.getAddonInfo("icon")
+        # Default artwork of list items
+        self.logo = os.path.join(self.media, "telia_logo.png")
+        self.fanart = os.path.join(self.resources, "fanart.jpg")
+
+        # Kodi calls are slow compared to dict lookups, so settings and
+        # strings are read once per process and kept here.
+        self.settings = {}
+        self.strings = {}
+
+    def reload(self):
+        self.settings.clear()
+        self.strings.clear()
 
     def plugin_url(self, params):
         if params:
@@ -34,11 +48,17 @@ class AddonUtils():
         if len(args) < 1:
             raise ValueError("String id missing")
         elif len(args) == 1:
-            string_id = args[0]
-            return self.addon.getLocalizedString(string_id)
+            return self._localized_string(args[0])
         else:
-            return [self.addon.getLocalizedString(string_id)
-                    for string_id in args]
+            return [self._localized_string(string_id) for string_id in args]
+
+    def _localized_string(self, string_id):
+        try:
+            return self.strings[string_id]
+        except KeyError:
+            string = self.addon.getLocalizedString(string_id)
+            self.strings[string_id] = string
+            return string
 
     def log(self, msg):
         xbmc.log(msg, xbmc.LOGDEBUG)
@@ -57,10 +77,16 @@ class AddonUtils():
         self.addon.openSettings()
 
     def get_setting(self, setting):
-        return self.addon.getSetting(setting).strip()
+        try:
+            return self.settings[setting]
+        except KeyError:
+            value = self.addon.getSetting(setting).strip()
+            self.settings[setting] = value
+            return value
 
     def set_setting(self, setting, value):
         self.addon.setSetting(setting, str(value))
+        self.settings[setting] = str(value).strip()
 
     def get_setting_as_bool(self, setting):
         return self.get_setting(setting).lower() == "true"
@@ -72,98 +98,94 @@ class AddonUtils():
         return int(self.get_setting_as_float(setting))
 
 
+_addon_utils = None
+
+
+def get_addon_utils():
+    # One instance per process; plugin invocations are short-lived
+    global _addon_utils
+    if _addon_utils is None:
+        _addon_utils = AddonUtils()
+    return _addon_utils
+
+
+_user_store = None
+
+
+def get_user_store():
+    # One connection per process, shared by all handlers
+    global _user_store
+    if _user_store is None:
+        _user_store = UserStore(get_addon_utils().profile)
+    return _user_store
+
+
 class UserDataHandler():
-    filename = "userdata.json"
 
     def __init__(self):
-        self.addon_utils = AddonUtils()
-        os.makedirs(self.addon_utils.profile, exist_ok=True)
-        self.filepath = os.path.join(
-            self.addon_utils.profile, self.filename
-        )
-        self.load()
-
-    def load(self):
-        try:
-            with open(self.filepath, "r") as data_file:
-                self.userdata_json = json.load(data_file)
-        except FileNotFoundError:
-            self.userdata_json = {}
-            self.save()
-
-    def save(self):
-        with open(self.filepath, "w") as data_file:
-            json.dump(self.userdata_json, data_file, indent=4)
+        self.addon_utils = get_addon_utils()
+        self.user_store = get_user_store()
 
     def add(self, username, userdata):
-        self.userdata_json.update({username: userdata})
-        self.save()
+        self.user_store.set_userdata(username, userdata)
 
     def remove(self, username):
-        if username in self.userdata_json:
-            self.userdata_json.pop(username)
-            self.save()
+        self.user_store.remove_userdata(username)
 
     def clear(self):
-        self.userdata_json = {}
-        self.save()
+        self.user_store.clear_userdata()
 
     def get(self, username):
-        if username in self.userdata_json:
-            return self.userdata_json[username]
-        else:
-            return None
+        return self.user_store.get_userdata(username)
 
 
 class SearchHistory():
-    filename = "search_history.json"
+    # Seconds the result pages of a saved query are reused
+    results_ttl = 3600
 
     def __init__(self, username):
         self.username = username
-        self.addon = AddonUtils()
-        os.makedirs(self.addon.profile, exist_ok=True)
-        self.save_path = os.path.join(self.addon.profile, self.filename)
-        self.load()
-
-    def load(self):
-        try:
-            with open(self.save_path, "r") as history_file:
-                self.history_json = json.load(history_file)
-                if self.username not in self.history_json:
-                    self.history_json[self.username] = []
-        except FileNotFoundError:
-            self.history_json = {}
-            self.history_json[self.username] = []
-            self.save()
-
-    def save(self):
-        with open(self.save_path, "w") as history_file:
-            json.dump(self.history_json, history_file, indent=4)
+        self.addon = get_addon_utils()
+        self.user_store = get_user_store()
+        self.results_cache = ResponseCache(self.addon.profile)
 
     def get(self, query_id):
         return self.get_queries()[int(query_id)]
 
-    def get_id(self, query, reload_data=False):
-        if reload_data:
-            self.load()
+    def get_id(self, query):
         try:
             return self.get_queries().index(query)
         except ValueError:
             return None
 
     def get_queries(self):
-        return self.history_json[self.username]
+        return self.user_store.get_queries(self.username)
 
     def add(self, query):
-        queries = self.history_json[self.username]
-        if query not in queries:
-            queries.insert(0, query)
-        self.save()
+        self.user_store.add_query(self.username, query)
 
     def remove(self, query_id):
-        del self.history_json[self.username][int(query_id)]
-        self.save()
+        query = self.get(query_id)
+        self.user_store.remove_query(self.username, query)
+        self.results_cache.clear(self._results_operation(query))
 
     def clear(self):
-        self.history_json[self.username] = []
-        self.save()
+        queries = self.get_queries()
+        self.user_store.clear_queries(self.username)
+        for query in queries:
+            self.results_cache.clear(self._results_operation(query))
+
+    def _results_operation(self, query):
+        # All pages of a query share a prefix so they can be dropped together
+        return "searchHistory-" + self.results_cache.key(self.username, query)
+
+    def get_results(self, query, page):
+        entry = self.results_cache.get(self._results_operation(query), page)
+        if entry is None or not self.results_cache.is_fresh(
+            entry, self.results_ttl
+        ):
+            return None
+        return entry["data"]
+
+    def set_results(self, query, page, results):
+        self.results_cache.set(self._results_operation(query), page, results)
@@ -0,0 +1,99 @@
+import functools
+import urllib.parse
+from resources.lib.timeutils import TimezoneStamps
+
+# Key holding the media of each panel type
+PANEL_CONTENT = {
+    "SelectionMediaPanel": "selectionMediaContent",
+    "MediaPanel": "mediaContent",
+    "ContinueWatchingPanel": "continueWatchingContent",
+    "MyListPanel": "myListContent",
+    "TimelinePanel": "timelineContent",
+    "RentalsPanel": "rentalsContent",
+    "StoresPanel": "storesContent"
+}
+
+# Stands in for missing or null objects so lookups can be chained
+_EMPTY = {}
+
+
+def panel_content(panel):
+    try:
+        content_key = PANEL_CONTENT[panel["__typename"]]
+    except KeyError:
+        return None
+    return panel.get(content_key)
+
+
+def image_url(images, name):
+    source = (images.get(name) or _EMPTY).get("source")
+    if not source:
+        return None
+    return urllib.parse.unquote(source) if "%" in source else source
+
+
+@functools.lru_cache(maxsize=None)
+def _duration_seconds(readable):
+    # Panels repeat the same few durations over and over
+    try:
+        return TimezoneStamps.convert_to_seconds(readable)
+    except (IndexError, ValueError):
+        return 0
+
+
+class MediaItem():
+    __slots__ = (
+        "id", "title", "is_series", "icon", "fanart", "genre", "description",
+        "short_description", "imdb", "rating", "duration", "price",
+        "episode", "available_from", "data"
+    )
+
+    def __init__(self, media):
+        # The media as received, for the local catalog
+        self.data = media
+        self.id = media["id"]
+        self.title = media.get("title") or ""
+        self.is_series = self.id.startswith("s")
+
+        images = media.get("images") or _EMPTY
+        self.icon = image_url(images, "showcard2x3")
+        self.fanart = image_url(images, "showcard16x9")
+
+        self.genre = media.get("genre") or ""
+        self.description = media.get("descriptionLong") or ""
+        self.short_description = media.get("description") or self.description
+
+        imdb = (media.get("ratings") or _EMPTY).get("imdb") or _EMPTY
+        imdb_url = imdb.get("url")
+        self.imdb = imdb_url.rsplit("/", 1)[-1] if imdb_url else ""
+        self.rating = imdb.get("readableScore") or ""
+
+        duration = (media.get("duration") or _EMPTY).get("readableShort")
+        self.duration = _duration_seconds(duration) if duration else 0
+
+        # Only rentals have a price
+        self.price = (media.get("price") or _EMPTY).get("readable")
+        self.episode = (media.get("episodeNumber") or _EMPTY).get("readable")
+        self.available_from = (
+            media.get("availableFrom") or _EMPTY
+        ).get("timestamp")
+
+    @property
+    def is_rental(self):
+        return self.price is not None
+
+
+def parse_media(media):
+    # Series ids start with 's', movies and episodes with 'm'
+    if media["id"][:1] not in ("s", "m"):
+        return None
+    return MediaItem(media)
+
+
+def parse_items(items):
+    media_items = []
+    for item in items or ():
+        media_item = parse_media(item["media"])
+        if media_item is not None:
+            media_items.append(media_item)
+    return media_items
@@ -1,28 +1,34 @@
-import os
+import sqlite3
 import functools
-import datetime
+import threading
 import uuid
 import urllib.parse
-import dateutil.parser
-import pytz
-import inputstreamhelper
 import xbmc
 from xbmcgui import ListItem, Dialog
 from xbmcplugin import addDirectoryItems, addSortMethod, \
         endOfDirectory, setResolvedUrl, SORT_METHOD_TITLE, \
         SORT_METHOD_UNSORTED, SORT_METHOD_DATEADDED
 from resources.lib.api import TeliaPlay, TeliaException
-from resources.lib.kodiutils import AddonUtils, UserDataHandler, \
+from resources.lib.artwork import ArtworkStore
+from resources.lib.auth import TokenManager
+from resources.lib.catalog import CatalogIndex
+from resources.lib.diagnostics import RequestLog, summarize
+from resources.lib.epg import EpgStore
+from resources.lib.kodiutils import get_addon_utils, UserDataHandler, \
     SearchHistory
-from resources.lib.timeutils import TimezoneStamps
+from resources.lib.media import MediaItem, image_url, panel_content, \
+    parse_items, parse_media
+from resources.lib.operations import OPERATIONS
+from resources.lib.timeutils import get_timezone_stamps
+from resources.lib.webutils import WebException
 
 
 def logging(method):
-    addon = AddonUtils()
-    debug = addon.get_setting_as_bool("debug")
 
     @functools.wraps(method)
     def wrapped_method_call(*args, **kwargs):
+        addon = get_addon_utils()
+        debug = addon.get_setting_as_bool("debug")
         if debug:
             args_repr = [repr(arg) for arg in args]
             kwargs_repr = [
@@ -39,9 +45,13 @@ def logging(method):
 
 
 class MenuList():
+    # Searching won't work if the number of results per page is too large.
+    search_results_per_page = 50
+    # Fewer titles than this found locally and Telia is searched instead
+    min_local_results = 10
 
     def __init__(self):
-        self.addon = AddonUtils()
+        self.addon = get_addon_utils()
         self.userdata_handler = UserDataHandler()
 
         username = self.addon.get_setting(
@@ -53,6 +63,8 @@ class MenuList():
         )
 
         self.search_history = SearchHistory(username)
+        # Media listed during this invocation, added to the local catalog
+        self.seen_media = []
         userdata = self.userdata_handler.get(username)
 
         if not userdata:
@@ -61,17 +73,29 @@ class MenuList():
             userdata = self.userdata_handler.get(username)
 
         self.telia_play = TeliaPlay(userdata)
+        self.token_manager = TokenManager(self.userdata_handler, username)
+        self.telia_play.on_unauthorized = functools.partial(
+            self.token_manager.refresh, self.telia_play
+        )
+        self.telia_play.on_fetched = self._keep_search_results
 
-        token_valid_time = dateutil.parser.isoparse(
-            userdata["tokenData"]["validTo"]
-        ) - datetime.timedelta(minutes=30)
+        if self.addon.get_setting_as_bool("prewarmArtwork"):
+            self.artwork_store = ArtworkStore(self.addon.profile)
+        else:
+            self.artwork_store = None
 
-        time_now = datetime.datetime.now(pytz.timezone("Europe/Stockholm"))
+        if self.token_manager.is_expired(userdata):
+            self.token_manager.refresh(self.telia_play)
+        elif self.token_manager.needs_refresh(userdata):
+            # The token still works, so renew it without holding up the
+            # listing. The service normally gets here first.
+            threading.Thread(target=self._refresh_token).start()
 
-        if time_now >= token_valid_time:
-            token_data = self.telia_play.refresh_token()
-            userdata["tokenData"] = token_data
-            self.userdata_handler.add(username, userdata)
+    def _refresh_token(self):
+        try:
+            self.token_manager.refresh(self.telia_play, blocking=False)
+        except (TeliaException, WebException) as error:
+            self.addon.log("Token refresh failed: {0}".format(error))
 
     def _add_folder_item(
         self, items, label, url, icon=None, fanart=None, sort_title="",
@@ -80,51 +104,170 @@ class MenuList():
         imdb="", rating="", title=""
     ):
 
-        if not fanart:
-            fanart = os.path.join(self.addon.resources, "fanart.jpg")
-
-        if not icon:
-            icon = os.path.join(self.addon.media, "telia_logo.png")
-
         list_item = ListItem(label=label, offscreen=offscreen)
-        list_item.setArt({"thumb": icon, "fanart": fanart})
-        if title:
-            list_item.setInfo("video", {
-                "title": title, "sorttitle": sort_title
-            })
-        else:
-            list_item.setInfo("video", {
-                "title": label, "sorttitle": sort_title
-            })
-
-        if is_playable:
-            list_item.setProperty("IsPlayable", "true")
-        else:
-            list_item.setProperty("IsPlayable", "false")
+        list_item.setArt({
+            "thumb": icon or self.addon.logo,
+            "fanart": fanart or self.addon.fanart
+        })
 
+        # Each call into Kodi is costly on slow boxes, so all info labels
+        # are set at once
+        info_labels = {"title": title or label, "sorttitle": sort_title}
         if datetime_str:
-            list_item.setInfo("video", {"dateadded": datetime_str})
-
+            info_labels["dateadded"] = datetime_str
         if duration:
-            list_item.setInfo("video", {"duration": duration})
-
+            info_labels["duration"] = duration
         if info:
-            list_item.setInfo("video", {"plot": info})
-
+            info_labels["plot"] = info
         if imdb:
-            list_item.setInfo("video", {"imdbnumber": imdb})
-
+            info_labels["imdbnumber"] = imdb
         if rating:
-            list_item.setInfo("video", {"rating": rating})
-
+            info_labels["rating"] = rating
         if genre:
-            list_item.setInfo("video", {"genre": genre})
+            info_labels["genre"] = genre
+        list_item.setInfo("video", info_labels)
+
+        list_item.setProperty("IsPlayable", "true" if is_playable else "false")
 
         if context_menu_items:
             list_item.addContextMenuItems(context_menu_items)
 
         items.append((url, list_item, is_folder))
 
+    def _add_media_item(self, items, media, label=None, info=None,
+                        my_list=False):
+        if label is None:
+            label = media.title
+
+        # Episodes are found through their series
+        if media.episode is None:
+            self.seen_media.append(media.data)
+
+        icon = media.icon
+        fanart = media.fanart
+        if self.artwork_store is not None:
+            icon = self.artwork_store.get(icon)
+            fanart = self.artwork_store.get(fanart)
+
+        context_url_add = self.addon.plugin_url({
+            "menu": "removeFromList" if my_list else "addToList",
+            "mediaId": media.id
+        })
+        context_menu = [
+            (self.addon.localize(30103 if my_list else 30020),
+             "RunPlugin({0})".format(context_url_add))
+        ]
+        if media.is_rental:
+            label = "{0} [COLOR red]({1})[/COLOR]".format(label, media.price)
+            context_url_rent = self.addon.plugin_url({
+                "menu": "rent",
+                "videoId": media.id
+            })
+            context_url_trailer = self.addon.plugin_url({
+                "menu": "play",
+                "streamType": "trailer",
+                "streamId": media.id
+            })
+            context_menu.append(
+                (self.addon.localize(30019),
+                 "PlayMedia({0})".format(context_url_trailer))
+            )
+            context_menu.append(
+                (self.addon.localize(30015),
+                 "RunPlugin({0})".format(context_url_rent))
+            )
+
+        if media.is_series:
+            plugin_url = self.addon.plugin_url({
+                "menu": "series",
+                "seriesId": media.id
+            })
+        else:
+            plugin_url = self.addon.plugin_url({
+                "menu": "play",
+                "streamType": "rental" if media.is_rental else "vod",
+                "streamId": media.id
+            })
+
+        self._add_folder_item(
+            items, label, plugin_url, icon, fanart,
+            info=media.description if info is None else info,
+            genre=media.genre, imdb=media.imdb, rating=media.rating,
+            duration=media.duration, is_folder=media.is_series,
+            is_playable=not media.is_series, context_menu_items=context_menu,
+            title=media.title
+        )
+
+    def _get_panel_page(self, panel_id, page, search=False, stale=False):
+        if not search:
+            results_per_page = self.addon.get_setting_as_int("moviesPerPage")
+            return self.telia_play.get_panel(
+                panel_id, results_per_page, page*results_per_page,
+                stale=stale
+            )
+        # Reuse panel menu for search menu; no need to reinvent the wheel.
+        query = self.search_history.get(panel_id)
+        results = self.search_history.get_results(query, page)
+        if results is None:
+            results = self.telia_play.search(
+                query, self.search_results_per_page,
+                page*self.search_results_per_page, stale=stale
+            )
+        return results
+
+    def _keep_search_results(self, name, variables, results):
+        # Only pages answered by Telia are stored, never a copy served
+        # stale, whether the listing, a pre-fetch or a refresh asked for it
+        if (name == "search" and
+                variables["limit"] == self.search_results_per_page):
+            self.search_history.set_results(
+                variables["q"], variables["offset"] // variables["limit"],
+                results
+            )
+
+    def _prewarm_artwork(self, panel, search=False):
+        urls = []
+        for media in parse_items(
+            panel.get("searchItems" if search else "items")
+        ):
+            urls.append(media.icon)
+            urls.append(media.fanart)
+        max_count = self.addon.get_setting_as_int("artworkMaxCount")
+        max_megabytes = self.addon.get_setting_as_int("artworkMaxMegabytes")
+        self.artwork_store.prewarm(urls, max_count, max_megabytes*1000000)
+
+    def _prefetch(self, panel_id, page, depth, search=False):
+        # Runs after the listing is shown, so failures only cost the head
+        # start
+        for next_page in range(page, page + depth):
+            try:
+                panel = self._get_panel_page(panel_id, next_page, search)
+            except (TeliaException, WebException) as error:
+                self.addon.log("Pre-fetching page {0} failed: {1}".format(
+                    next_page, error
+                ))
+                return
+
+            if next_page == page and self.artwork_store is not None:
+                self._prewarm_artwork(panel, search)
+
+            if not ("pageInfo" in panel and panel["pageInfo"]["hasNextPage"]):
+                return
+
+    def _start_prefetch(self, panel_id, page, search=False):
+        if self.addon.get_setting_as_bool("prefetchPages"):
+            depth = self.addon.get_setting_as_int("prefetchDepth")
+        else:
+            depth = 0
+        if self.artwork_store is not None:
+            # The artwork is found through the next page
+            depth = max(depth, 1)
+
+        if depth > 0:
+            threading.Thread(
+                target=self._prefetch, args=(panel_id, page, depth, search)
+            ).start()
+
     def _end_folder(self, items, sort_methods=()):
         addDirectoryItems(self.addon.handle, items, totalItems=len(items))
 
@@ -133,6 +276,22 @@ class MenuList():
 
         endOfDirectory(self.addon.handle)
 
+        if self.seen_media:
+            threading.Thread(
+                target=self._update_catalog, args=(self.seen_media,)
+            ).start()
+            self.seen_media = []
+
+    def _update_catalog(self, medias):
+        try:
+            catalog_index = CatalogIndex(self.addon.profile)
+            try:
+                catalog_index.add(medias)
+            finally:
+                catalog_index.close()
+        except sqlite3.Error as error:
+            self.addon.log("Updating the catalog failed: {0}".format(error))
+
     @logging
     def telia_login(self, username, password):
         boot_uuid = str(uuid.uuid4())
@@ -145,12 +304,12 @@ class MenuList():
         telia_play = TeliaPlay(userdata)
         token_data = telia_play.login(username, password)
         telia_play.validate_login()
-        userdata["tokenData"] = token_data
+        TokenManager.set_token(userdata, token_data)
         return userdata
 
     @logging
     def main_menu(self):
-        menu_items = self.telia_play.get_main_menu()
+        menu_items = self.telia_play.get_main_menu(stale=True)
 
         items = []
         for item in menu_items:
@@ -185,15 +344,40 @@ class MenuList():
         query = self.addon.get_user_input(self.addon.localize(30102))
         if query != "":
             self.search_history.add(query)
-            return self.search_history.get_id(query, reload_data=True)
+            return self.search_history.get_id(query)
         return None
 
+    @logging
+    def search_results_menu(self, query_id):
+        query = self.search_history.get(query_id)
+        catalog_index = CatalogIndex(self.addon.profile)
+        medias = catalog_index.search(query, self.search_results_per_page)
+        catalog_index.close()
+
+        if len(medias) < self.min_local_results:
+            self.panel_menu(query_id, 0, search=True)
+            return
+
+        items = []
+        for media in medias:
+            media = parse_media(media)
+            if media is not None:
+                self._add_media_item(items, media)
+
+        plugin_url = self.addon.plugin_url({
+            "menu": "search",
+            "panelId": query_id,
+            "page": 0
+        })
+        self._add_folder_item(items, self.addon.localize(30024), plugin_url)
+        self._end_folder(items)
+
     @logging
     def show_search_history(self):
         items = []
         for (query_id, query) in enumerate(self.search_history.get_queries()):
-            url = "{0}?menu={1}&panelId={2}&page=0".format(
-                self.addon.url, "search", query_id
+            url = "{0}?menu={1}&panelId={2}".format(
+                self.addon.url, "searchresults", query_id
             )
             remove_url = "{0}?menu={1}&panelId={2}".format(
                 self.addon.url, "removesearch", query_id
@@ -221,7 +405,7 @@ class MenuList():
 
     @logging
     def page_menu(self, page_id):
-        menu_items = self.telia_play.get_page(page_id)
+        menu_items = self.telia_play.get_page(page_id, stale=True)
 
         items = []
         for item in menu_items:
@@ -234,150 +418,29 @@ class MenuList():
 
     @logging
     def page_submenu(self, page_id, menu_id):
-        start_menu = self.telia_play.get_page(page_id)
+        start_menu = self.telia_play.get_page(page_id, stale=True)
 
         for submenu in start_menu:
             if menu_id == submenu["title"]:
-                if submenu["__typename"] == "SelectionMediaPanel":
-                    menu = submenu["selectionMediaContent"]
-                elif submenu["__typename"] == "MediaPanel":
-                    menu = submenu["mediaContent"]
-                elif submenu["__typename"] == "ContinueWatchingPanel":
-                    menu = submenu["continueWatchingContent"]
-                elif submenu["__typename"] == "MyListPanel":
-                    menu = submenu["myListContent"]
-                elif submenu["__typename"] == "TimelinePanel":
-                    menu = submenu["timelineContent"]
-                elif submenu["__typename"] == "RentalsPanel":
-                    menu = submenu["rentalsContent"]
-                elif submenu["__typename"] == "StoresPanel":
-                    menu = submenu["storesContent"]
+                menu = panel_content(submenu)
+                if menu is None:
+                    return
+                if submenu["__typename"] == "StoresPanel":
                     self.play_stores_menu(menu["items"])
                     return
                 break
         else:
             return
 
-        menu_items = menu["items"]
-        if not menu_items:
-            menu_items = []
-
         items = []
-        for item in menu_items:
-            media = item["media"]
-
-            try:
-                icon = urllib.parse.unquote(
-                    media["images"]["showcard2x3"]["source"]
-                )
-            except Exception:
-                icon = None
-
-            try:
-                fanart = urllib.parse.unquote(
-                    media["images"]["showcard16x9"]["source"]
-                )
-            except Exception:
-                fanart = None
-
-            try:
-                genre = media["genre"]
-            except Exception:
-                genre = ""
-
-            try:
-                desc = media["description"]
-            except Exception:
-                desc = ""
-
-            if not desc:
-                try:
-                    desc = media["descriptionLong"]
-                except Exception:
-                    desc = ""
-
-            try:
-                imdb_url = media["ratings"]["imdb"]["url"]
-                imdb = imdb_url.split("/")[-1]
-            except Exception:
-                imdb = ""
-
-            try:
-                rating = media["ratings"]["imdb"]["readableScore"]
-            except Exception:
-                rating = ""
-
-            try:
-                duration = media["duration"]["readableShort"]
-                duration = TimezoneStamps(
-                    "Europe/Stockholm"
-                ).convert_to_seconds(duration)
-            except Exception:
-                duration = 0
-
-            context_url_add = self.addon.plugin_url({
-                "menu": "addToList" if menu_id != "Min lista"
-                else "removeFromList",
-                "mediaId": media["id"],
-            })
-            context_menu = [
-                (self.addon.localize(
-                    30103 if menu_id == "Min lista" else 30020
-                ),
-                 "RunPlugin({0})".format(context_url_add))
-            ]
-
-            try:
-                title = media["title"]
-                label = "{0} [COLOR red]({1})[/COLOR]".format(
-                    title, media["price"]["readable"]
-                )
-                context_url_rent = self.addon.plugin_url({
-                    "menu": "rent",
-                    "videoId": media["id"]
-                })
-                context_url_trailer = self.addon.plugin_url({
-                    "menu": "play",
-                    "streamType": "trailer",
-                    "streamId": media["id"]
-                })
-                context_menu.append(
-                    (self.addon.localize(30019),
-                     "PlayMedia({0})".format(context_url_trailer))
-                )
-                context_menu.append(
-                    (self.addon.localize(30015),
-                     "RunPlugin({0})".format(context_url_rent))
-                )
-                is_rental = True
-            except Exception:
-                label = media["title"]
-                is_rental = False
-
-            if media["id"].startswith("s"):
-                plugin_url = self.addon.plugin_url({
-                    "menu": "series",
-                    "seriesId": media["id"]
-                })
-                is_folder = True
-                is_playable = False
-            elif media["id"].startswith("m"):
-                plugin_url = self.addon.plugin_url({
-                    "menu": "play",
-                    "streamType": "rental" if is_rental else "vod",
-                    "streamId": media["id"]
-                })
-                is_folder = False
-                is_playable = True
-
-            self._add_folder_item(
-                items, label, plugin_url, icon, fanart, genre=genre,
-                is_playable=is_playable, is_folder=is_folder, info=desc,
-                imdb=imdb, duration=duration, context_menu_items=context_menu,
-                rating=rating, title=title
+        my_list = menu_id == "Min lista"
+        for media in parse_items(menu["items"]):
+            self._add_media_item(
+                items, media, info=media.short_description, my_list=my_list
             )
 
-        if "pageInfo" in menu and menu["pageInfo"]["hasNextPage"]:
+        has_next_page = "pageInfo" in menu and menu["pageInfo"]["hasNextPage"]
+        if has_next_page:
             plugin_url = self.addon.plugin_url({
                 "menu": "panel",
                 "panelId": submenu["id"],
@@ -389,6 +452,8 @@ class MenuList():
             )
 
         self._end_folder(items)
+        if has_next_page:
+            self._start_prefetch(submenu["id"], 0)
 
     @logging
     def play_stores_menu(self, channels=None):
@@ -458,117 +523,16 @@ class MenuList():
 
         for panel in store_panels["items"]:
             if panel_id == panel["id"]:
-                if panel["__typename"] == "SelectionMediaPanel":
-                    panel = panel["selectionMediaContent"]
-                elif panel["__typename"] == "MediaPanel":
-                    panel = panel["mediaContent"]
+                panel = panel_content(panel)
+                if panel is None:
+                    return
                 break
         else:
             return
 
         items = []
-        for item in panel["items"]:
-            media = item["media"]
-            try:
-                icon = urllib.parse.unquote(
-                    media["images"]["showcard2x3"]["source"]
-                )
-            except Exception:
-                icon = None
-
-            try:
-                fanart = urllib.parse.unquote(
-                    media["images"]["showcard16x9"]["source"]
-                )
-            except Exception:
-                fanart = None
-
-            try:
-                description = media["descriptionLong"]
-            except Exception:
-                description = ""
-
-            try:
-                genre = media["genre"]
-            except Exception:
-                genre = ""
-
-            try:
-                imdb_url = media["ratings"]["imdb"]["url"]
-                imdb = imdb_url.split("/")[-1]
-            except Exception:
-                imdb = ""
-
-            try:
-                rating = media["ratings"]["imdb"]["readableScore"]
-            except Exception:
-                rating = ""
-
-            try:
-                duration = media["duration"]["readableShort"]
-                duration = TimezoneStamps(
-                    "Europe/Stockholm"
-                ).convert_to_seconds(duration)
-            except Exception:
-                duration = 0
-
-            context_url_add = self.addon.plugin_url({
-                "menu": "addToList",
-                "mediaId": media["id"],
-            })
-            context_menu = [
-                (self.addon.localize(30020),
-                 "RunPlugin({0})".format(context_url_add))
-            ]
-            try:
-                title = media["title"]
-                label = "{0} [COLOR red]({1})[/COLOR]".format(
-                    title, media["price"]["readable"]
-                )
-                context_url_rent = self.addon.plugin_url({
-                    "menu": "rent",
-                    "videoId": media["id"]
-                })
-                context_url_trailer = self.addon.plugin_url({
-                    "menu": "play",
-                    "streamType": "trailer",
-                    "streamId": media["id"]
-                })
-                context_menu.append(
-                    (self.addon.localize(30019),
-                     "PlayMedia({0})".format(context_url_trailer))
-                )
-                context_menu.append(
-                    (self.addon.localize(30015),
-                     "RunPlugin({0})".format(context_url_rent))
-                )
-                is_rental = True
-            except Exception:
-                label = media["title"]
-                is_rental = False
-
-            if media["id"].startswith("s"):
-                plugin_url = self.addon.plugin_url({
-                    "menu": "series",
-                    "seriesId": media["id"]
-                })
-                is_folder = True
-                is_playable = False
-            elif media["id"].startswith("m"):
-                plugin_url = self.addon.plugin_url({
-                    "menu": "play",
-                    "streamType": "rental" if is_rental else "vod",
-                    "streamId": media["id"]
-                })
-                is_folder = False
-                is_playable = True
-
-            self._add_folder_item(
-                items, label, plugin_url, icon, fanart,
-                info=description, genre=genre, is_playable=is_playable,
-                is_folder=is_folder, imdb=imdb, duration=duration,
-                context_menu_items=context_menu, rating=rating, title=title
-            )
+        for media in parse_items(panel["items"]):
+            self._add_media_item(items, media)
 
         if "pageInfo" in panel and panel["pageInfo"]["hasNextPage"]:
             plugin_url = self.addon.plugin_url({
@@ -585,134 +549,18 @@ class MenuList():
 
     @logging
     def panel_menu(self, panel_id, page, search=False):
-        results_per_page = self.addon.get_setting_as_int("moviesPerPage")
-        offset = page*results_per_page
-
-        if not search:
-            panel = self.telia_play.get_panel(
-                panel_id, results_per_page, offset
-            )
-        else:
-            # Reuse panel menu for search menu; no need to reinvent the wheel.
-            query = self.search_history.get(panel_id)
-            # Searching won't work if the number of results per page is too large.
-            results_per_page = 50
-            offset = page*results_per_page
-            panel = self.telia_play.search(query, results_per_page, offset)
+        panel = self._get_panel_page(panel_id, page, search, stale=True)
 
         items = []
-        try:
-            if not search:
-                panel_items = panel["items"]
-            else:
-                panel_items = panel["searchItems"]
-        except KeyError:
-            panel_items = []
-
-        for item in panel_items:
-            media = item["media"]
-            try:
-                icon = urllib.parse.unquote(
-                    media["images"]["showcard2x3"]["source"]
-                )
-            except Exception:
-                icon = None
-
-            try:
-                fanart = urllib.parse.unquote(
-                    media["images"]["showcard16x9"]["source"]
-                )
-            except Exception:
-                fanart = None
-
-            try:
-                description = media["descriptionLong"]
-            except Exception:
-                description = ""
-
-            try:
-                genre = media["genre"]
-            except Exception:
-                genre = ""
-
-            try:
-                imdb_url = media["ratings"]["imdb"]["url"]
-                imdb = imdb_url.split("/")[-1]
-            except Exception:
-                imdb = ""
-
-            try:
-                rating = media["ratings"]["imdb"]["readableScore"]
-            except Exception:
-                rating = ""
-
-            try:
-                duration = media["duration"]["readableShort"]
-                duration = TimezoneStamps(
-                    "Europe/Stockholm"
-                ).convert_to_seconds(duration)
-            except Exception:
-                duration = 0
-
-            context_url_add = self.addon.plugin_url({
-                "menu": "addToList",
-                "mediaId": media["id"],
-            })
-            context_menu = [
-                (self.addon.localize(30020),
-                 "RunPlugin({0})".format(context_url_add))
-            ]
-            try:
-                title = media["title"]
-                label = "{0} [COLOR red]({1})[/COLOR]".format(
-                    title, media["price"]["readable"]
-                )
-                context_url_rent = self.addon.plugin_url({
-                    "menu": "rent",
-                    "videoId": media["id"]
-                })
-                context_url_trailer = self.addon.plugin_url({
-                    "menu": "play",
-                    "streamType": "trailer",
-                    "streamId": media["id"]
-                })
-                context_menu.append(
-                    (self.addon.localize(30019),
-                     "PlayMedia({0})".format(context_url_trailer))
-                )
-                context_menu.append(
-                    (self.addon.localize(30015),
-                     "RunPlugin({0})".format(context_url_rent))
-                )
-                is_rental = True
-            except Exception:
-                label = media["title"]
-                is_rental = False
-
-            if media["id"].startswith("s"):
-                plugin_url = self.addon.plugin_url({
-                    "menu": "series",
-                    "seriesId": media["id"]
-                })
-                is_folder = True
-                is_playable = False
-            elif media["id"].startswith("m"):
-                plugin_url = self.addon.plugin_url({
-                    "menu": "play",
-                    "streamType": "rental" if is_rental else "vod",
-                    "streamId": media["id"]
-                })
-                is_folder = False
-                is_playable = True
-
-            self._add_folder_item(
-                items, label, plugin_url, icon, fanart,
-                info=description, genre=genre, is_playable=is_playable,
-                is_folder=is_folder, imdb=imdb, rating=rating,
-                context_menu_items=context_menu, title=title, duration=duration
-            )
+        for media in parse_items(
+            panel.get("searchItems" if search else "items")
+        ):
+            self._add_media_item(items, media)
 
-        if "pageInfo" in panel and panel["pageInfo"]["hasNextPage"]:
+        has_next_page = (
+            "pageInfo" in panel and panel["pageInfo"]["hasNextPage"]
+        )
+        if has_next_page:
             plugin_url = self.addon.plugin_url({
                 "menu": "search" if search else "panel",
                 "panelId": panel_id,
@@ -723,14 +571,55 @@ class MenuList():
                 items, self.addon.localize(30014), plugin_url
             )
 
+            if page == 0:
+                plugin_url = self.addon.plugin_url({
+                    "menu": "search" if search else "panel",
+                    "panelId": panel_id,
+                    "page": "all"
+                })
+
+                self._add_folder_item(
+                    items, self.addon.localize(30023), plugin_url
+                )
+
         self._end_folder(items)
+        if has_next_page:
+            self._start_prefetch(panel_id, page+1, search)
+
+    @logging
+    def panel_all_menu(self, panel_id, search=False):
+        max_items = self.addon.get_setting_as_int("showAllMaxItems")
+        if not search:
+            results_per_page = self.addon.get_setting_as_int("moviesPerPage")
+            windows = self.telia_play.get_all_panel(
+                panel_id, results_per_page, max_items
+            )
+        else:
+            query = self.search_history.get(panel_id)
+            windows = self.telia_play.search_all(
+                query, self.search_results_per_page, max_items
+            )
+
+        # Windows fetched at different moments may overlap
+        media_items = {}
+        for window in windows:
+            for media in parse_items(
+                window.get("searchItems" if search else "items")
+            ):
+                media_items.setdefault(media.id, media)
+
+        items = []
+        for media in list(media_items.values())[:max_items]:
+            self._add_media_item(items, media)
+
+        self._end_folder(items, (SORT_METHOD_UNSORTED, SORT_METHOD_TITLE))
 
     @logging
     def rent_menu(self, video_id):
         rent_ok = Dialog().yesno(self.addon.name, self.addon.localize(30101))
 
         if rent_ok:
-            tz_sthlm_stamps = TimezoneStamps("Europe/Stockholm")
+            tz_sthlm_stamps = get_timezone_stamps("Europe/Stockholm")
             pin_code = self.addon.get_setting(
                 "PIN" + self.addon.get_setting("DefaultUser")
             )
@@ -775,113 +664,26 @@ class MenuList():
         items = []
 
         media = series["suggestedEpisode"]
-        try:
-            icon = urllib.parse.unquote(
-                series["images"]["backdrop16x9"]["source"]
-            )
-        except Exception:
-            icon = None
-
-        try:
-            fanart = urllib.parse.unquote(
-                series["images"]["backdrop16x9"]["source"]
-            )
-        except Exception:
-            fanart = None
-
-        try:
-            description = media["descriptionLong"]
-        except Exception:
-            description = ""
+        images = series.get("images") or {}
+        icon = fanart = image_url(images, "backdrop16x9")
 
-        try:
-            genre = media["genre"]
-        except Exception:
-            genre = ""
+        suggested = parse_media(media)
+        if suggested is not None:
+            # The suggested episode is shown with the series artwork
+            suggested.icon = suggested.fanart = icon
+            self._add_media_item(items, suggested, label=suggested.episode)
 
-        try:
-            duration = media["duration"]["readableShort"]
-            duration = TimezoneStamps(
-                "Europe/Stockholm"
-            ).convert_to_seconds(duration)
-        except Exception:
-            duration = 0
-
-        context_url_add = self.addon.plugin_url({
-            "menu": "addToList",
-            "mediaId": media["id"],
+        plugin_url = self.addon.plugin_url({
+            "menu": "allEpisodes",
+            "seriesId": series_id
         })
-        context_menu = [
-            (self.addon.localize(30020),
-             "RunPlugin({0})".format(context_url_add))
-        ]
-        try:
-            label = "{0} [COLOR red]({1})[/COLOR]".format(
-                media["episodeNumber"]["readable"], media["price"]["readable"]
-            )
-            context_url_rent = self.addon.plugin_url({
-                "menu": "rent",
-                "videoId": media["id"]
-            })
-            context_url_trailer = self.addon.plugin_url({
-                "menu": "play",
-                "streamType": "trailer",
-                "streamId": media["id"]
-            })
-            context_menu.append(
-                (self.addon.localize(30019),
-                 "PlayMedia({0})".format(context_url_trailer))
-            )
-            context_menu.append(
-                (self.addon.localize(30015),
-                 "RunPlugin({0})".format(context_url_rent))
-            )
-            is_rental = True
-        except Exception:
-            label = media["episodeNumber"]["readable"]
-            is_rental = False
-
-        if media["id"].startswith("s"):
-            plugin_url = self.addon.plugin_url({
-                "menu": "series",
-                "seriesId": media["id"]
-            })
-            is_folder = True
-            is_playable = False
-        elif media["id"].startswith("m"):
-            plugin_url = self.addon.plugin_url({
-                "menu": "play",
-                "streamType": "rental" if is_rental else "vod",
-                "streamId": media["id"]
-            })
-            is_folder = False
-            is_playable = True
-
         self._add_folder_item(
-            items, label, plugin_url, icon, fanart, info=description,
-            is_folder=is_folder, is_playable=is_playable, genre=genre,
-            duration=duration, context_menu_items=context_menu
+            items, self.addon.localize(30022), plugin_url, icon, fanart
         )
 
+        icon = image_url(images, "showcard2x3")
         for season in media["series"]["seasonLinks"]["items"]:
-            try:
-                icon = urllib.parse.unquote(
-                    series["images"]["showcard2x3"]["source"]
-                )
-            except Exception:
-                icon = None
-
-            try:
-                fanart = urllib.parse.unquote(
-                    series["images"]["backdrop16x9"]["source"]
-                )
-            except Exception:
-                fanart = None
-
-            try:
-                description = season["descriptionLong"]
-            except Exception:
-                description = ""
+            description = season.get("descriptionLong") or ""
 
             plugin_url = self.addon.plugin_url({
                 "menu": "season",
@@ -902,75 +704,71 @@ class MenuList():
         episodes = self.telia_play.get_season(season_id)
 
         items = []
-        for episode in episodes:
-            try:
-                icon = urllib.parse.unquote(
-                    episode["images"]["showcard2x3"]["source"]
-                )
-            except Exception:
-                icon = None
+        self._add_episode_items(items, episodes)
+        self._end_folder(items, sort_methods=(SORT_METHOD_DATEADDED,))
 
-            try:
-                fanart = urllib.parse.unquote(
-                    episode["images"]["showcard16x9"]["source"]
-                )
-            except Exception:
-                fanart = None
+    @logging
+    def all_episodes_menu(self, series_id):
+        series = self.telia_play.get_series(series_id)
 
-            try:
-                description = episode["descriptionLong"]
-            except Exception:
-                description = ""
+        if not series:
+            return
 
-            try:
-                tz_sthlm_stamps = TimezoneStamps("Europe/Stockholm")
-                datetime_str = tz_sthlm_stamps.local_datetime_str(
-                    episode["availableFrom"]["timestamp"],
-                    "%Y-%m-%d %H:%M:%S", "ms"
-                )
-                date_label = tz_sthlm_stamps.local_datetime_str(
-                    episode["availableFrom"]["timestamp"], "%x", "ms"
+        seasons = sorted(
+            series["suggestedEpisode"]["series"]["seasonLinks"]["items"],
+            key=lambda season: season["seasonNumber"]["number"]
+        )
+        # All seasons are fetched together, each sorted by episode number
+        season_episodes = self.telia_play.get_seasons(
+            [season["id"] for season in seasons], order="ASC"
+        )
+
+        items = []
+        for episodes in season_episodes:
+            self._add_episode_items(items, episodes)
+        self._end_folder(
+            items, sort_methods=(SORT_METHOD_UNSORTED, SORT_METHOD_DATEADDED)
+        )
+
+    def _add_episode_items(self, items, episodes):
+        tz_sthlm_stamps = get_timezone_stamps("Europe/Stockholm")
+        for episode in episodes:
+            media = MediaItem(episode)
+
+            if media.available_from is not None:
+                available_from = tz_sthlm_stamps.local_datetime(
+                    media.available_from, "ms"
                 )
-                time_label = tz_sthlm_stamps.local_datetime_str(
-                    episode["availableFrom"]["timestamp"], "%X", "ms"
+                datetime_str = available_from.strftime("%Y-%m-%d %H:%M:%S")
+                date_label = available_from.strftime("%x")
+                time_label = tz_sthlm_stamps.time_label(
+                    media.available_from, "ms"
                 )
-                time_label = tz_sthlm_stamps.strip_seconds(time_label)
-            except Exception:
+            else:
                 datetime_str = ""
                 date_label = ""
                 time_label = ""
 
-            try:
-                duration = episode["duration"]["readableShort"]
-                duration = TimezoneStamps(
-                    "Europe/Stockholm"
-                ).convert_to_seconds(duration)
-            except Exception:
-                duration = 0
-
-            try:
+            if media.is_rental:
                 episode_label = "{0} [COLOR red]({1})[/COLOR]".format(
-                    episode["episodeNumber"]["readable"],
-                    episode["price"]["readable"]
+                    media.episode, media.price
                 )
                 context_url = self.addon.plugin_url({
                     "menu": "rent",
-                    "videoId": episode["id"]
+                    "videoId": media.id
                 })
                 context_menu = [
                     (self.addon.localize(30015),
                      "RunPlugin({0})".format(context_url))
                 ]
-                is_rental = True
-            except Exception:
-                episode_label = episode["episodeNumber"]["readable"]
+            else:
+                episode_label = media.episode
                 context_menu = None
-                is_rental = False
 
             plugin_url = self.addon.plugin_url({
                 "menu": "play",
-                "streamType": "rental" if is_rental else "vod",
-                "streamId": episode["id"]
+                "streamType": "rental" if media.is_rental else "vod",
+                "streamId": media.id
             })
 
             label = "{0} [COLOR orange]{1}[/COLOR] [COLOR yellow]{2}[/COLOR]".format(
@@ -978,21 +776,64 @@ class MenuList():
             )
 
             self._add_folder_item(
-                items, label, plugin_url, icon, fanart, info=description,
-                is_playable=True, is_folder=False, datetime_str=datetime_str,
-                duration=duration, context_menu_items=context_menu
+                items, label, plugin_url, media.icon, media.fanart,
+                info=media.description, is_playable=True, is_folder=False,
+                datetime_str=datetime_str, duration=media.duration,
+                context_menu_items=context_menu
             )
 
-        self._end_folder(items, sort_methods=(SORT_METHOD_DATEADDED,))
-
     @logging
-    def tv_channels_menu(self, page=0):
+    def tv_channels_menu(self, page=0, all_channels=False):
         channel_limit = self.addon.get_setting_as_int("channelsPerPage")
         offset = channel_limit*page
-        tz_sthlm_stamps = TimezoneStamps("Europe/Stockholm")
-        menu = self.telia_play.get_channels(
-            tz_sthlm_stamps.now("ms"), channel_limit, offset
-        )
+        tz_sthlm_stamps = get_timezone_stamps("Europe/Stockholm")
+        # Snap to the cache lifetime so listings fetched by the service
+        # and by earlier visits can be reused.
+        resolution = OPERATIONS["getTvChannels"].ttl
+        epg_store = EpgStore(self.addon.profile)
+        if not all_channels:
+            menu = epg_store.get_channel_window(
+                channel_limit, offset, tz_sthlm_stamps.now("ms")
+            )
+            if menu is None:
+                menu = self.telia_play.get_channels(
+                    tz_sthlm_stamps.now("ms", resolution), channel_limit,
+                    offset
+                )
+                epg_store.set_channel_window(channel_limit, offset, menu)
+        else:
+            windows = []
+            window = {"pageInfo": {"hasNextPage": True}}
+            while window is not None and window["pageInfo"]["hasNextPage"]:
+                window = epg_store.get_channel_window(
+                    channel_limit, len(windows)*channel_limit,
+                    tz_sthlm_stamps.now("ms")
+                )
+                windows.append(window)
+            if None in windows:
+                windows = self.telia_play.get_all_channels(
+                    tz_sthlm_stamps.now("ms", resolution), channel_limit
+                )
+                for (window_offset, window) in enumerate(windows):
+                    epg_store.set_channel_window(
+                        channel_limit, window_offset*channel_limit, window
+                    )
+            menu = {"channelItems": [
+                channel for window in windows
+                for channel in window["channelItems"]
+            ]}
+        epg_store.close()
+
+        # The day navigation is the same for every channel apart from the
+        # channel id
+        days = []
+        for (day_offset, day_label) in tz_sthlm_stamps.day_labels(
+            range(-EpgStore.catchup_days, EpgStore.catchup_days + 1),
+            "%a %d %b"
+        ):
+            if day_offset == 0:
+                day_label = "[COLOR blue]{0}[/COLOR]".format(day_label)
+            days.append((day_offset, day_label))
 
         items = []
         for channel in menu["channelItems"]:
@@ -1011,30 +852,18 @@ class MenuList():
             except Exception:
                 fanart = None
 
-            context_url = self.addon.plugin_url({
+            context_url = urllib.parse.unquote(self.addon.plugin_url({
                 "menu": "page",
                 "pageId": "epg",
                 "dayOffset": "{0}",
                 "channelId": channel["id"]
-            })
-
-            tz_sthlm_stamps = TimezoneStamps("Europe/Stockholm")
-            context_menu = []
-            for day_offset in range(-7, 8):
-                timestamp = tz_sthlm_stamps.today(day_offset, units="ms")
-                menu_entry_label = tz_sthlm_stamps.local_datetime_str(
-                    timestamp, "%a %d %b", "ms"
-                )
-                if day_offset == 0:
-                    menu_entry_label = "[COLOR blue]{0}[/COLOR]".format(
-                        menu_entry_label
-                    )
-                context_menu.append(
-                    (menu_entry_label,
-                     "ActivateWindow(videos, {0}, return)".format(
-                         urllib.parse.unquote(context_url).format(day_offset)
-                     ))
-                )
+            }))
+            context_menu = [
+                (day_label, "ActivateWindow(videos, {0}, return)".format(
+                    context_url.format(day_offset)
+                ))
+                for (day_offset, day_label) in days
+            ]
 
             plugin_url = self.addon.plugin_url({
                 "menu": "play",
@@ -1060,19 +889,49 @@ class MenuList():
             self._add_folder_item(
                 items, self.addon.localize(30013), plugin_url
             )
+
+            plugin_url = self.addon.plugin_url({
+                "menu": "page",
+                "pageId": "epg",
+                "page": "all"
+            })
+
+            self._add_folder_item(
+                items, self.addon.localize(30021), plugin_url
+            )
         self._end_folder(items)
 
     @logging
     def tv_programs_menu(self, channel_id, day_offset):
-        tz_sthlm_stamps = TimezoneStamps("Europe/Stockholm")
+        tz_sthlm_stamps = get_timezone_stamps("Europe/Stockholm")
         timestamp = tz_sthlm_stamps.today(int(day_offset), "ms")
+        timestamp_end = tz_sthlm_stamps.today(int(day_offset) + 1, "ms")
+
+        epg_store = EpgStore(self.addon.profile)
+        if epg_store.is_day_synced(channel_id, timestamp, timestamp_end):
+            programs = epg_store.get_programs(
+                channel_id, timestamp, timestamp_end
+            )
+        else:
+            channel = self.telia_play.get_channel(
+                channel_id, timestamp
+            )
+            programs = channel["programs"]["programItems"]
+            epg_store.set_programs(
+                channel_id, timestamp, timestamp_end, programs
+            )
+            epg_store.prune(
+                tz_sthlm_stamps.today(-EpgStore.catchup_days, "ms")
+            )
+        epg_store.close()
 
-        channel = self.telia_play.get_channel(
-            channel_id, timestamp
+        timestamp_now = tz_sthlm_stamps.now("ms")
+        start_times = tz_sthlm_stamps.time_labels(
+            [program["startTime"]["timestamp"] for program in programs], "ms"
         )
 
         items = []
-        for program in channel["programs"]["programItems"]:
+        for (program, start_time) in zip(programs, start_times):
             try:
                 icon = urllib.parse.unquote(
                     program["media"]["images"]["showcard2x3"]["source"]
@@ -1097,23 +956,11 @@ class MenuList():
             except Exception:
                 rating = ""
 
-            timestamp_now = tz_sthlm_stamps.now("ms")
-
             start_timestamp = program["startTime"]["timestamp"]
             end_timestamp = program["endTime"]["timestamp"]
             is_live = start_timestamp <= timestamp_now <= end_timestamp
             duration = (end_timestamp - start_timestamp) // 1000
 
-            start_time = tz_sthlm_stamps.local_datetime_str(
-                start_timestamp, "%X", "ms"
-            )
-            start_time = tz_sthlm_stamps.strip_seconds(start_time)
-
-            end_time = tz_sthlm_stamps.local_datetime_str(
-                end_timestamp, "%X", "ms"
-            )
-            end_time = tz_sthlm_stamps.strip_seconds(end_time)
-
             title = program["media"]["title"]
             label = "[COLOR yellow]{2}[/COLOR] [COLOR {0}]{1}[/COLOR]".format(
                 "blue" if is_live else "white", title, start_time
@@ -1139,6 +986,15 @@ class MenuList():
 
         self._end_folder(items)
 
+    @logging
+    def diagnostics_menu(self):
+        records = RequestLog(self.addon.profile).records()
+        header = "{0} - {1}".format(self.addon.name, self.addon.localize(30107))
+        Dialog().textviewer(
+            header,
+            summarize(records) if records else self.addon.localize(30108)
+        )
+
     @logging
     def play_stream(self, stream_id, stream_type):
         if stream_type == "live_vod":
@@ -1147,6 +1003,9 @@ class MenuList():
         else:
             is_live_vod = False
 
+        # Only needed for playback, so keep it off the browsing routes
+        import inputstreamhelper
+
         self.telia_play.validate_stream()
         stream = self.telia_play.get_stream(stream_id, stream_type)
 
@@ -0,0 +1,161 @@
+import json
+import urllib.parse
+
+GRAPHQL_HOST = "graphql-telia.t6a.net"
+
+
+class GraphqlOperation():
+
+    def __init__(self, name, sha256_hash, variables=(), response_path=(),
+                 ttl=0, idempotent=True, invalidates=(), host=GRAPHQL_HOST,
+                 keep_expired=True):
+        self.name = name
+        self.sha256_hash = sha256_hash
+        # Variables every call has to provide
+        self.variables = frozenset(variables)
+        # Keys leading from the response to the part callers want
+        self.response_path = tuple(response_path)
+        # Seconds a response may be served from the cache; 0 disables it
+        self.ttl = ttl
+        # Expired responses are kept for stale serving and revalidation,
+        # unless their variables follow the clock and they are never asked
+        # for again
+        self.keep_expired = keep_expired
+        # Queries are sent as GET, mutations as POST
+        self.idempotent = idempotent
+        # Cached operations made outdated by this one
+        self.invalidates = tuple(invalidates)
+        self.host = host
+
+        self.extensions = {
+            "persistedQuery": {
+                "version": 1,
+                "sha256Hash": sha256_hash
+            }
+        }
+        self.url = "https://{0}/graphql".format(host)
+        # Only the variables differ between calls, so the rest of the query
+        # string is encoded once.
+        self.url_prefix = "{0}?{1}&variables=".format(
+            self.url, urllib.parse.urlencode({
+                "operationName": name,
+                "extensions": json.dumps(self.extensions)
+            })
+        )
+
+    @property
+    def cacheable(self):
+        return self.idempotent and self.ttl > 0
+
+    def check_variables(self, variables):
+        missing = self.variables.difference(variables)
+        if missing:
+            raise ValueError("Operation '{0}' is missing variables: {1}".format(
+                self.name, ", ".join(sorted(missing))
+            ))
+
+    def request(self, variables):
+        self.check_variables(variables)
+        if self.idempotent:
+            url = self.url_prefix + urllib.parse.quote_plus(
+                json.dumps(variables, ensure_ascii=False)
+            )
+            return ({"GET": {"url": url}}, None)
+        return ({"POST": {"url": self.url}}, self.payload(variables))
+
+    def payload(self, variables):
+        return {
+            "operationName": self.name,
+            "variables": variables,
+            "extensions": self.extensions
+        }
+
+    def extract(self, response_json):
+        data = response_json
+        for key in self.response_path:
+            data = data[key]
+        return data
+
+
+OPERATIONS = {operation.name: operation for operation in (
+    GraphqlOperation(
+        "getMainMenu",
+        "f9c1eb6c91def27ee800da2296922d3798a54a8af32f79f25661afb621f1b45d",
+        response_path=("data", "mainMenu", "items"),
+        ttl=3600
+    ),
+    GraphqlOperation(
+        "search",
+        "dc9d71dbf7da4f5e5854d9e58e33274379581e07c353f8868cf0d7988c1330de",
+        variables=("q", "limit", "offset", "searchRentalsType",
+                   "searchSubscriptionType"),
+        response_path=("data", "search2"),
+        ttl=300
+    ),
+    GraphqlOperation(
+        "getPage",
+        "9bb1e827055ad3fa20a0a3bf652605f851dcdd34401ae24a3aea4b7b5ae257c4",
+        variables=("id",),
+        response_path=("data", "page", "pagePanels", "items"),
+        ttl=600
+    ),
+    GraphqlOperation(
+        "getTvChannels",
+        "a16edac021bc6892ce4a17560cd364c716e1dd086fc4bd2a11e0b031577b3af7",
+        variables=("timestamp", "limit", "programLimit", "offset"),
+        response_path=("data", "channels"),
+        ttl=300,
+        keep_expired=False
+    ),
+    GraphqlOperation(
+        "getTvChannel",
+        "9af1a674ce9482ca4d89b1bb623a5b69b725cf3c9c6565a93a6c7b04f443891b",
+        variables=("timestamp", "offset", "id"),
+        response_path=("data", "channel"),
+        ttl=300,
+        keep_expired=False
+    ),
+    GraphqlOperation(
+        "getStorePage",
+        "e2297df5af0241be95800fbb6758b502808cd00de3e10fdaed865e308e499f4e",
+        variables=("id", "pagePanelsOffset"),
+        response_path=("data", "store"),
+        ttl=3600
+    ),
+    GraphqlOperation(
+        "getPanel",
+        "299f78202946997a0e56f9c4fa4360300f7404fdbe3fe77580bb3003843568b1",
+        variables=("id", "config"),
+        response_path=("data", "panel", "selectionMediaContent"),
+        ttl=900
+    ),
+    GraphqlOperation(
+        "getSeries",
+        "4bbb65b9bf621902b3f3dc30ae036ff36d9fa57f024f6e3bd10cb55c57f0033d",
+        variables=("id",),
+        response_path=("data", "series"),
+        ttl=1800
+    ),
+    GraphqlOperation(
+        "getSeason",
+        "0772731aec9d8b4aecddb3d2dfd1743b32b1db8b0f6d8a03f37bf7ce6c032688",
+        variables=("seasonId", "sort"),
+        response_path=("data", "season", "episodes", "episodeItems"),
+        ttl=900
+    ),
+    GraphqlOperation(
+        "addToMyList",
+        "a8369da660da6f45e0eabd53756effcd4c40668f1794a853c298c29e7903c7f9",
+        variables=("id", "type"),
+        idempotent=False,
+        # 'Min lista' is a panel of the start page
+        invalidates=("getPage",)
+    ),
+    GraphqlOperation(
+        "removeFromMyList",
+        "630c2f99d817682d4f15d41084cdc2f40dc158a5dae0bd2ab0e815ce268da277",
+        variables=("id", "type"),
+        idempotent=False,
+        invalidates=("getPage",)
+    ),
+)}
@@ -1,9 +1,10 @@
 import sys
 from urllib.parse import parse_qsl
 from xbmcgui import Dialog
+from resources.lib import diagnostics
 from resources.lib.api import TeliaException
 from resources.lib.menus import MenuList
-from resources.lib.kodiutils import AddonUtils
+from resources.lib.kodiutils import get_addon_utils
 
 
 class Router():
@@ -21,13 +22,18 @@ class Router():
                     self.params["storeId"], self.params["panelId"]
                 )
             elif self.params["menu"] == "panel":
-                self.menu_list.panel_menu(
-                    self.params["panelId"], int(self.params["page"])
-                )
+                if self.params["page"] == "all":
+                    self.menu_list.panel_all_menu(self.params["panelId"])
+                else:
+                    self.menu_list.panel_menu(
+                        self.params["panelId"], int(self.params["page"])
+                    )
             elif self.params["menu"] == "series":
                 self.menu_list.series_menu(self.params["seriesId"])
             elif self.params["menu"] == "season":
                 self.menu_list.season_menu(self.params["seasonId"])
+            elif self.params["menu"] == "allEpisodes":
+                self.menu_list.all_episodes_menu(self.params["seriesId"])
             elif self.params["menu"] == "rent":
                 self.menu_list.rent_menu(self.params["videoId"])
             elif self.params["menu"] == "searchmenu":
@@ -35,13 +41,22 @@ class Router():
             elif self.params["menu"] == "newsearch":
                 query_id = self.menu_list.search()
                 if query_id is not None:
-                    self.menu_list.panel_menu(query_id, 0, search=True)
-            elif self.params["menu"] == "search":
-                self.menu_list.panel_menu(
-                    int(self.params["panelId"]),
-                    int(self.params["page"]),
-                    search=True
+                    self.menu_list.search_results_menu(query_id)
+            elif self.params["menu"] == "searchresults":
+                self.menu_list.search_results_menu(
+                    int(self.params["panelId"])
                 )
+            elif self.params["menu"] == "search":
+                if self.params["page"] == "all":
+                    self.menu_list.panel_all_menu(
+                        int(self.params["panelId"]), search=True
+                    )
+                else:
+                    self.menu_list.panel_menu(
+                        int(self.params["panelId"]),
+                        int(self.params["page"]),
+                        search=True
+                    )
             elif self.params["menu"] == "history":
                 self.menu_list.show_search_history()
             elif self.params["menu"] == "removesearch":
@@ -59,6 +74,8 @@ class Router():
                     self.params["mediaId"]
                 )
                 self.menu_list.refresh()
+            elif self.params["menu"] == "diagnostics":
+                self.menu_list.diagnostics_menu()
             elif self.params["menu"] == "play":
                 self.menu_list.play_stream(
                     self.params["streamId"], self.params["streamType"]
@@ -89,10 +106,11 @@ class Router():
         else:
             if "page" not in self.params:
                 self.menu_list.tv_channels_menu()
+            elif self.params["page"] == "all":
+                self.menu_list.tv_channels_menu(all_channels=True)
             else:
                 self.menu_list.tv_channels_menu(int(self.params["page"]))
 
-
     def play_store(self):
         if "storeId" in self.params:
             self.menu_list.play_store_menu(self.params["storeId"])
@@ -103,9 +121,21 @@ class Router():
 def run():
     paramstring = sys.argv[2][1:]
     params = dict(parse_qsl(paramstring))
+    diagnostics.start_invocation(params.get("menu", "main"))
 
-    try:
+    def route():
         router = Router(params)
         router.main_menu()
+
+    addon = get_addon_utils()
+    try:
+        if addon.get_setting_as_bool("profiling"):
+            from resources.lib.profiling import RouteProfiler
+            RouteProfiler(
+                addon.profile, "menu=" + params.get("menu", "main"),
+                memory=addon.get_setting_as_bool("profileMemory")
+            ).run(route)
+        else:
+            route()
     except TeliaException as te:
-        Dialog().textviewer(AddonUtils().name, str(te))
+        Dialog().textviewer(addon.name, str(te))
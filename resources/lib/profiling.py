@@ -0,0 +1,52 @@
+import os
+import time
+
+
+class RouteProfiler():
+    dirname = "profiles"
+    # Runs kept per route; older files are deleted
+    keep = 20
+
+    def __init__(self, profile, route, memory=False):
+        self.profiles_path = os.path.join(profile, self.dirname)
+        os.makedirs(self.profiles_path, exist_ok=True)
+        self.route = route
+        self.memory = memory
+
+    def run(self, function):
+        # Only loaded when profiling is switched on
+        import cProfile
+        import tracemalloc
+
+        stem = os.path.join(self.profiles_path, "{0}-{1}-{2}".format(
+            self.route, time.strftime("%Y%m%d-%H%M%S"), os.getpid()
+        ))
+        if self.memory:
+            tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return function()
+        finally:
+            profiler.disable()
+            profiler.dump_stats(stem + ".prof")
+            if self.memory:
+                tracemalloc.take_snapshot().dump(stem + ".snapshot")
+                tracemalloc.stop()
+            self.rotate()
+
+    def rotate(self):
+        prefix = self.route + "-"
+        stems = sorted({
+            os.path.splitext(filename)[0]
+            for filename in os.listdir(self.profiles_path)
+            if filename.startswith(prefix)
+        })
+        for stem in stems[:-self.keep]:
+            for extension in (".prof", ".snapshot"):
+                try:
+                    os.remove(
+                        os.path.join(self.profiles_path, stem + extension)
+                    )
+                except FileNotFoundError:
+                    pass
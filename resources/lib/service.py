@@ -0,0 +1,170 @@
+import time
+import sqlite3
+import threading
+import xbmc
+from resources.lib import broker, diagnostics
+from resources.lib.api import TeliaException
+from resources.lib.catalog import CatalogIndex
+from resources.lib.epg import EpgStore
+from resources.lib.kodiutils import get_addon_utils, UserDataHandler
+from resources.lib.webutils import WebException
+from resources.lib.menus import MenuList
+from resources.lib.operations import OPERATIONS
+from resources.lib.timeutils import get_timezone_stamps
+
+# Failures of a single step, logged so the service keeps going. ValueError
+# is a response that isn't JSON, like a 502 error page, TypeError and
+# KeyError a response missing what was asked for, sqlite3.Error a store
+# another process holds locked.
+STEP_ERRORS = (
+    TeliaException, WebException, ValueError, TypeError, KeyError,
+    sqlite3.Error
+)
+
+
+class PrewarmService():
+    # Seconds between two rounds of pre-fetching
+    interval = 3600
+    # Seconds between checks whether the token is due for renewal
+    token_check_interval = 300
+    # Cached responses untouched for this long are deleted. Expired copies
+    # are still served while refreshing or when Telia can't be reached, so
+    # they are kept well beyond their TTL, unless nothing asks for them
+    # again.
+    cache_max_age = 30*86400
+    # Pre-warmed artwork untouched for this long is deleted
+    artwork_max_age = 86400
+    # Titles not listed for this long are dropped from the local catalog
+    catalog_max_age = 30*86400
+    # Main menu entries the plugin lists without getPage, see
+    # Router.page_menu
+    non_page_ids = ("epg",)
+
+    def __init__(self):
+        self.monitor = xbmc.Monitor()
+        self.addon = get_addon_utils()
+        # Credentials of a login that failed, not tried again until the
+        # user changes them
+        self.failed_credentials = None
+
+    def credentials(self):
+        default_user = self.addon.get_setting("defaultUser")
+        return (
+            self.addon.get_setting("user" + default_user),
+            self.addon.get_setting("pass" + default_user)
+        )
+
+    def can_log_in(self, credentials):
+        # Repeated logins with wrong credentials could lock the account, so
+        # each set of credentials is tried once
+        return bool(credentials[0]) and credentials != self.failed_credentials
+
+    def prewarm(self, menu_list):
+        for (name, step) in (
+            ("pages", self.prewarm_pages),
+            ("channels", self.prewarm_channels),
+            ("stores", self.prune)
+        ):
+            if self.monitor.abortRequested():
+                return
+            # One failing step leaves the others to run
+            try:
+                step(menu_list)
+            except STEP_ERRORS as error:
+                self.addon.log("Pre-fetching {0} failed: {1}".format(
+                    name, error
+                ))
+
+    def prewarm_pages(self, menu_list):
+        telia_play = menu_list.telia_play
+        page_ids = [
+            item["id"] for item in telia_play.get_main_menu()
+            if item["id"] not in self.non_page_ids
+        ]
+        telia_play.get_pages(page_ids)
+
+    def prewarm_channels(self, menu_list):
+        tz_sthlm_stamps = get_timezone_stamps("Europe/Stockholm")
+        resolution = OPERATIONS["getTvChannels"].ttl
+        channel_limit = self.addon.get_setting_as_int("channelsPerPage")
+        channels = menu_list.telia_play.get_channels(
+            tz_sthlm_stamps.now("ms", resolution), channel_limit, 0
+        )
+        epg_store = EpgStore(self.addon.profile)
+        try:
+            epg_store.set_channel_window(channel_limit, 0, channels)
+            epg_store.prune(
+                tz_sthlm_stamps.today(-EpgStore.catchup_days, "ms")
+            )
+        finally:
+            epg_store.close()
+
+    def prune(self, menu_list):
+        response_cache = menu_list.telia_play.response_cache
+        for operation in OPERATIONS.values():
+            if operation.cacheable and not operation.keep_expired:
+                response_cache.prune(operation.ttl, operation.name)
+        response_cache.prune(self.cache_max_age)
+        if menu_list.artwork_store is not None:
+            menu_list.artwork_store.prune(self.artwork_max_age)
+        catalog_index = CatalogIndex(self.addon.profile)
+        try:
+            catalog_index.prune(self.catalog_max_age)
+        finally:
+            catalog_index.close()
+
+    def start_broker(self):
+        if not (self.addon.get_setting_as_bool("useBroker") and
+                broker.is_supported()):
+            return None
+
+        broker_server = broker.BrokerServer(
+            broker.socket_path(self.addon.profile)
+        )
+        threading.Thread(target=broker_server.serve_forever).start()
+        return broker_server
+
+    def check(self, next_prewarm):
+        credentials = self.credentials()
+        logged_in = bool(UserDataHandler().get(credentials[0]))
+        if not (logged_in or self.can_log_in(credentials)):
+            return next_prewarm
+
+        try:
+            # Logs in or refreshes the token, just like a plugin
+            # invocation would
+            try:
+                menu_list = MenuList()
+            except (TeliaException, WebException):
+                if not logged_in:
+                    self.failed_credentials = credentials
+                raise
+            # Renew ahead of time so plugin invocations never have to
+            menu_list.token_manager.refresh_if_due(menu_list.telia_play)
+            if time.time() >= next_prewarm:
+                self.prewarm(menu_list)
+                next_prewarm = time.time() + self.interval
+        except STEP_ERRORS as error:
+            self.addon.log("Pre-fetch failed: {0}".format(error))
+        return next_prewarm
+
+    def run(self):
+        broker_server = self.start_broker()
+        next_prewarm = 0
+
+        while not self.monitor.abortRequested():
+            # The service outlives setting changes made by the user
+            self.addon.reload()
+            diagnostics.start_invocation("service")
+            next_prewarm = self.check(next_prewarm)
+
+            if self.monitor.waitForAbort(self.token_check_interval):
+                break
+
+        if broker_server is not None:
+            broker_server.shutdown()
+            broker_server.server_close()
+
+
+def run():
+    PrewarmService().run()
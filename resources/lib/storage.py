@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class UserStore():
+    filename = "userdata.db"
+    # Files used before the store existed, moved aside once migrated
+    userdata_filename = "userdata.json"
+    search_history_filename = "search_history.json"
+
+    def __init__(self, profile):
+        self.profile = profile
+        os.makedirs(profile, exist_ok=True)
+        # Token refreshes and pre-fetches use the store from other threads
+        self.connection = sqlite3.connect(
+            os.path.join(profile, self.filename), timeout=10,
+            check_same_thread=False
+        )
+        self.lock = threading.Lock()
+        # Readers in other plugin invocations don't wait for writers
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+        self.migrate()
+
+    def create_tables(self):
+        with self.lock, self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS userdata (
+                    username TEXT PRIMARY KEY,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS search_history (
+                    username TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    added REAL NOT NULL,
+                    PRIMARY KEY (username, query)
+                );
+            """)
+
+    def _execute(self, sql, parameters=()):
+        with self.lock, self.connection:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def _load_json(self, filename):
+        try:
+            with open(os.path.join(self.profile, filename), "r") as json_file:
+                return json.load(json_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _retire_json(self, filename):
+        filepath = os.path.join(self.profile, filename)
+        try:
+            os.replace(filepath, filepath + ".migrated")
+        except FileNotFoundError:
+            # Migrated by another invocation in the meantime
+            pass
+
+    def migrate(self):
+        userdata_json = self._load_json(self.userdata_filename)
+        history_json = self._load_json(self.search_history_filename)
+        if userdata_json is None and history_json is None:
+            return
+
+        # Queries were kept newest first
+        now = time.time()
+        history_rows = [
+            (username, query, now - position)
+            for (username, queries) in (history_json or {}).items()
+            for (position, query) in enumerate(queries)
+        ]
+        with self.lock, self.connection:
+            # Rows written since then win over the old files
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO userdata VALUES (?, ?)",
+                [(username, json.dumps(userdata))
+                 for (username, userdata) in (userdata_json or {}).items()]
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO search_history VALUES (?, ?, ?)",
+                history_rows
+            )
+        if userdata_json is not None:
+            self._retire_json(self.userdata_filename)
+        if history_json is not None:
+            self._retire_json(self.search_history_filename)
+
+    def get_userdata(self, username):
+        rows = self._execute(
+            "SELECT data FROM userdata WHERE username = ?", (username,)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def set_userdata(self, username, userdata):
+        self._execute(
+            "INSERT OR REPLACE INTO userdata VALUES (?, ?)",
+            (username, json.dumps(userdata))
+        )
+
+    def remove_userdata(self, username):
+        self._execute("DELETE FROM userdata WHERE username = ?", (username,))
+
+    def clear_userdata(self):
+        self._execute("DELETE FROM userdata")
+
+    def get_queries(self, username):
+        rows = self._execute(
+            "SELECT query FROM search_history WHERE username = ? "
+            "ORDER BY added DESC", (username,)
+        )
+        return [query for (query,) in rows]
+
+    def add_query(self, username, query):
+        # A query already in the history keeps its place
+        self._execute(
+            "INSERT OR IGNORE INTO search_history VALUES (?, ?, ?)",
+            (username, query, time.time())
+        )
+
+    def remove_query(self, username, query):
+        self._execute(
+            "DELETE FROM search_history WHERE username = ? AND query = ?",
+            (username, query)
+        )
+
+    def clear_queries(self, username):
+        self._execute(
+            "DELETE FROM search_history WHERE username = ?", (username,)
+        )
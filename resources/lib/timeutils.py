@@ -1,6 +1,5 @@
 import functools
 from datetime import datetime, timedelta
-import pytz
 
 
 class TimestampsException(Exception):
@@ -19,30 +18,71 @@ def unit_conversion_factor(units):
     return factor
 
 
+def parse_iso_datetime(time_str):
+    try:
+        return datetime.fromisoformat(time_str.replace("Z", "+00:00"))
+    except ValueError:
+        # Loading dateutil is slow, only use it for odd formats
+        import dateutil.parser
+        return dateutil.parser.isoparse(time_str)
+
+
 class TimezoneStamps():
 
     def __init__(self, area):
+        # pytz loads its timezone database on import
+        import pytz
         self.timezone = pytz.timezone(area)
+        # Time labels by minute since the epoch
+        self.time_label_memo = {}
 
     def today(self, day_offset=0, units="s"):
         factor = unit_conversion_factor(units)
         today_date = datetime.now(self.timezone) + timedelta(days=day_offset)
-        today_date = datetime(
+        today_date = self.timezone.localize(datetime(
             today_date.year, today_date.month, today_date.day, 0, 0,
             0, 0
-        )
+        ))
         return int(datetime.timestamp(today_date) * factor)
 
-    def now(self, units="s"):
+    def now(self, units="s", resolution=1):
         factor = unit_conversion_factor(units)
         now_date = datetime.now(self.timezone)
-        return int(datetime.timestamp(now_date) * factor)
+        now_stamp = datetime.timestamp(now_date)
+        if resolution > 1:
+            now_stamp = now_stamp // resolution * resolution
+        return int(now_stamp * factor)
 
-    @staticmethod
-    def local_datetime_str(timestamp, time_format, units):
+    def local_datetime(self, timestamp, units):
         factor = unit_conversion_factor(units)
-        datetime_object = datetime.fromtimestamp(timestamp // factor)
-        return datetime_object.strftime(time_format)
+        return datetime.fromtimestamp(timestamp // factor, self.timezone)
+
+    def local_datetime_str(self, timestamp, time_format, units):
+        return self.local_datetime(timestamp, units).strftime(time_format)
+
+    def time_label(self, timestamp, units):
+        # Listings repeat the same start and end times, so labels are
+        # formatted once per minute
+        minute = timestamp // (unit_conversion_factor(units)*60)
+        try:
+            return self.time_label_memo[minute]
+        except KeyError:
+            label = self.strip_seconds(
+                self.local_datetime_str(minute*60, "%X", "s")
+            )
+            self.time_label_memo[minute] = label
+            return label
+
+    def time_labels(self, timestamps, units):
+        return [self.time_label(timestamp, units) for timestamp in timestamps]
+
+    def day_labels(self, day_offsets, time_format):
+        return [
+            (day_offset, self.local_datetime_str(
+                self.today(day_offset), time_format, "s"
+            ))
+            for day_offset in day_offsets
+        ]
 
     @staticmethod
     def strip_seconds(time_str):
@@ -69,3 +109,9 @@ class TimezoneStamps():
             elif unit == "tim":
                 seconds += int(value)*3600
         return seconds
+
+
+@functools.lru_cache(maxsize=None)
+def get_timezone_stamps(area):
+    # Loading a timezone is slow, so each one is loaded once per process
+    return TimezoneStamps(area)
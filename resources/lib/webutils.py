@@ -1,5 +1,50 @@
+import time
+import threading
 import urllib.parse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from resources.lib.broker import BrokerClient, BrokerException
+
+# Time spent opening connections by the current thread's request
+_connect_timer = threading.local()
+
+
+class _TimedConnectionMixin():
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timer.seconds += time.perf_counter() - start
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool
+        }
 
 
 class WebException(Exception):
@@ -8,24 +53,124 @@ class WebException(Exception):
 
 class WebUtils():
 
-    def __init__(self):
+    def __init__(self, broker_path=None, request_log=None):
         self.session = requests.session()
+        if broker_path:
+            self.broker = BrokerClient(broker_path)
+        else:
+            self.broker = None
+        self.request_log = request_log
+        # Writes every request and response to a fixture directory
+        self.recorder = None
+        # Base URLs used instead of hosts, e.g. to reach a stand-in server
+        self.host_overrides = {}
+        if request_log is not None:
+            self.session.mount("http://", _TimedAdapter())
+            self.session.mount("https://", _TimedAdapter())
 
     def make_request(self, request, headers=None, payload=None):
         url = self.extract_url(request)
         method = list(request.keys())[0]
+        _connect_timer.seconds = 0
+        start = time.perf_counter()
+        try:
+            response = self._send(
+                method, self._override_host(url), headers, payload
+            )
+            first_byte = time.perf_counter()
+            # Streamed responses are downloaded here
+            response.content
+        except requests.exceptions.RequestException as re:
+            self._log(method, url, payload, None, start)
+            raise WebException(str(re))
+        self._log(method, url, payload, response, start, first_byte)
+        if self.recorder is not None:
+            self.recorder.record(
+                self.operation_name(url, payload), method, url, headers,
+                payload, response
+            )
+        return response
+
+    def _override_host(self, url):
+        if not self.host_overrides:
+            return url
+        (scheme, host, path, query, fragment) = urllib.parse.urlsplit(url)
+        try:
+            base_url = self.host_overrides[host]
+        except KeyError:
+            return url
+        return base_url + urllib.parse.urlunsplit(
+            ("", "", path, query, fragment)
+        )
+
+    def _send(self, method, url, headers, payload):
+        if self.broker is not None and self.broker.is_running():
+            try:
+                return self.broker.request(
+                    method, url, headers=headers, payload=payload)
+            except BrokerException:
+                # Broker went away; carry on with a direct request
+                pass
+
         if method == "GET":
-            response = self.session.get(url, headers=headers, json=payload)
+            return self.session.get(
+                url, headers=headers, json=payload, stream=True)
         elif method == "POST":
-            response = self.session.post(url, headers=headers, json=payload)
+            return self.session.post(
+                url, headers=headers, json=payload, stream=True)
         elif method == "DELETE":
-            response = self.session.delete(url, headers=headers, json=payload)
-        else:
-            raise WebException("Unknown method '{0}'".format(method))
-        return response
+            return self.session.delete(
+                url, headers=headers, json=payload, stream=True)
+        raise WebException("Unknown method '{0}'".format(method))
+
+    def _log(self, method, url, payload, response, start, first_byte=None):
+        if self.request_log is None:
+            return
+        downloaded = time.perf_counter()
+
+        decode = 0
+        if response is not None and response.content:
+            try:
+                response_json = response.json()
+            except ValueError:
+                pass
+            else:
+                decode = time.perf_counter() - downloaded
+                # Saves callers from decoding the same content again
+                response.json = lambda **kwargs: response_json
+
+        connect = _connect_timer.seconds
+        if first_byte is None:
+            first_byte = downloaded
+        self.request_log.append({
+            "operation": self.operation_name(url, payload),
+            "method": method,
+            "status": "error" if response is None else response.status_code,
+            "bytes": 0 if response is None else len(response.content),
+            # Milliseconds
+            "connect": round(connect*1000, 1),
+            "ttfb": round((first_byte - start - connect)*1000, 1),
+            "download": round((downloaded - first_byte)*1000, 1),
+            "decode": round(decode*1000, 1),
+            "total": round((downloaded - start + decode)*1000, 1)
+        })
+
+    @staticmethod
+    def operation_name(url, payload=None):
+        if isinstance(payload, list):
+            return "batch"
+        if isinstance(payload, dict) and "operationName" in payload:
+            return payload["operationName"]
+        (path, _, query) = url.partition("?")
+        if "operationName=" in query:
+            return urllib.parse.parse_qs(query)["operationName"][0]
+        return path.rstrip("/").rsplit("/", 1)[-1]
 
     def extract_url(self, request):
         method = list(request.keys())[0]
+        # Prebuilt URLs, see GraphqlOperation.request
+        if "url" in request[method]:
+            return request[method]["url"]
 
         try:
             path = request[method]["filename"]